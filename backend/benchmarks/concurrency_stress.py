@@ -0,0 +1,223 @@
+# Adds transactions, mines and replaces blocks from several threads while others keep reading the chain and orders,
+# then checks that readers never saw an inconsistent state and that the chain and its index are still valid
+# Usage (from the backend directory): python -m benchmarks.concurrency_stress
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from block import Block
+from blockchain import Blockchain
+from chain_index import ChainIndex
+from chain_verifier import ChainVerifier
+from transaction.create_order import CreateOrder
+from transaction.create_organization import CreateOrganization
+from transaction.update_order import UpdateOrder
+
+duration = 10.0 # Seconds
+transaction_writers = 4
+chain_readers = 4
+order_readers = 4
+organizations = 5
+# Every run is repeated for each size, None keeps the whole chain in memory, a small cache makes readers load blocks
+# from the block store while it is changed
+block_cache_sizes = [None, 8]
+# Seconds between requests of a thread, like requests arriving over the network, without them busy threads starve
+# the others of the GIL
+write_interval = 0.001
+read_interval = 0.0002
+seed = 1
+
+def find_proof(block: Block) -> str:
+	static_data = block.get_static_data()
+
+	while True:
+		proof = block.compute_hash(static_data)
+		if Blockchain.is_valid_proof(proof):
+			return proof
+
+		block.nonce += 1
+
+class StressTest:
+	def __init__(self, blockchain: Blockchain):
+		self.blockchain = blockchain
+		self.stop_event = threading.Event()
+		self.errors: list[str] = []
+		self.counts: dict[str, int] = {}
+		self.latencies: dict[str, list[float]] = {}
+		self.counts_lock = threading.Lock()
+
+		self.organizations: list[str] = []
+		self.order_codes: list[str] = []
+
+	def record(self, name: str, latency: float = None):
+		with self.counts_lock:
+			self.counts[name] = self.counts.get(name, 0) + 1
+
+			if latency is not None:
+				self.latencies.setdefault(name, []).append(latency)
+
+	def fail(self, message: str):
+		with self.counts_lock:
+			self.errors.append(message)
+
+	def write_transactions(self, rng: random.Random):
+		while not self.stop_event.wait(write_interval):
+			organization = rng.choice(self.organizations)
+
+			if not self.order_codes or rng.random() < 0.3:
+				tx = CreateOrder(organization, {'item': rng.randrange(1000)})
+			else:
+				tx = UpdateOrder(organization, {'status': rng.randrange(10)}, rng.choice(self.order_codes))
+
+			if self.blockchain.add_new_transaction(tx):
+				self.record('transactions added')
+
+				if isinstance(tx, CreateOrder):
+					self.order_codes.append(tx.order_code)
+			else:
+				self.record('transactions rejected')
+
+	def mine(self):
+		while not self.stop_event.is_set():
+			if self.blockchain.mine():
+				self.record('blocks mined')
+			else:
+				time.sleep(0.01)
+
+	def replace_blocks(self, rng: random.Random):
+		while not self.stop_event.wait(rng.uniform(0.2, 0.5)):
+			# Build a longer branch of empty blocks which forks off a few blocks before the tip, keeping the organizations
+			snapshot = self.blockchain.snapshot
+			fork_point = max(2, len(snapshot) - rng.randint(1, 3))
+			prev_block = snapshot[fork_point - 1]
+
+			blocks = []
+			for index in range(fork_point, len(snapshot) + 1):
+				block = Block(index, [], prev_block.hash)
+				block.hash = find_proof(block)
+				blocks.append(block)
+				prev_block = block
+
+			if self.blockchain.replace_blocks(fork_point, blocks):
+				self.record('chains replaced')
+
+	def read_chain(self):
+		while not self.stop_event.wait(read_interval):
+			start = time.perf_counter()
+			snapshot = self.blockchain.snapshot
+
+			try:
+				blocks = snapshot[max(0, len(snapshot) - 20):]
+			except RuntimeError as e:
+				self.fail(str(e))
+				continue
+
+			self.record('chain reads', time.perf_counter() - start)
+
+			for prev_block, block in zip(blocks, blocks[1:]):
+				if block.index != prev_block.index + 1 or block.prev_hash != prev_block.hash:
+					self.fail(f'Snapshot of length {len(snapshot)} is not linked at block {block.index}')
+
+	def read_orders(self, rng: random.Random):
+		while not self.stop_event.wait(read_interval):
+			if not self.order_codes:
+				time.sleep(0.01)
+				continue
+
+			order_code = rng.choice(self.order_codes)
+
+			start = time.perf_counter()
+			with self.blockchain.state_lock.read():
+				history = self.blockchain.get_order_all_transactions(order_code)
+			self.record('order reads', time.perf_counter() - start)
+
+			# Orders created in replaced blocks no longer exist
+			if not history:
+				continue
+
+			if history[-1]['type'] != 1 or any(tx['order_code'] != order_code for tx in history):
+				self.fail(f'Order {order_code} has an invalid history')
+
+			for newer, older in zip(history, history[1:]):
+				if newer['prev_tx_id'] != older['tx_id']:
+					self.fail(f'Order {order_code} has a broken history at {newer["tx_id"]}')
+
+	def check_final_state(self):
+		blockchain = self.blockchain
+
+		invalid_index = ChainVerifier().verify_store(Blockchain.blocks_dir, blockchain.store.height)
+		if invalid_index is not None:
+			self.fail(f'Chain is invalid at block {invalid_index}')
+
+		# Index built from scratch has to match the one that was updated by all threads
+		index = ChainIndex()
+		index.rebuild(blockchain.chain)
+		for block_number, transactions in zip(blockchain.mempool.block_numbers, blockchain.mempool.blocks):
+			for position, tx in enumerate(transactions):
+				index.add_transaction(tx, block_number, position)
+
+		if (index.transactions, index.orders, index.owner_orders) != (blockchain.chain_index.transactions, blockchain.chain_index.orders, blockchain.chain_index.owner_orders):
+			self.fail('Chain index does not match the chain and mempool')
+
+		stored = [blockchain.store.read_block(i).hash for i in range(blockchain.store.height)]
+		if stored != [block.hash for block in blockchain.chain]:
+			self.fail('Stored blocks do not match the chain')
+
+	def run(self):
+		for i in range(organizations):
+			tx = CreateOrganization({'name': f'Organization {i}'})
+			self.blockchain.add_new_transaction(tx)
+			self.organizations.append(tx.tx_id)
+
+		self.blockchain.mine()
+
+		rng = random.Random(seed)
+		threads = [threading.Thread(target=self.mine), threading.Thread(target=self.replace_blocks, args=(random.Random(rng.random()),))]
+		threads += [threading.Thread(target=self.write_transactions, args=(random.Random(rng.random()),)) for _ in range(transaction_writers)]
+		threads += [threading.Thread(target=self.read_chain) for _ in range(chain_readers)]
+		threads += [threading.Thread(target=self.read_orders, args=(random.Random(rng.random()),)) for _ in range(order_readers)]
+
+		for thread in threads:
+			thread.start()
+
+		time.sleep(duration)
+		self.stop_event.set()
+		self.blockchain.miner.cancel()
+
+		for thread in threads:
+			thread.join()
+
+		self.check_final_state()
+
+def main():
+	errors = []
+
+	for block_cache_size in block_cache_sizes:
+		print(f'block cache size: {block_cache_size}')
+		os.chdir(tempfile.mkdtemp())
+
+		test = StressTest(Blockchain(mining_workers=1, block_cache_size=block_cache_size))
+		test.run()
+
+		for name, count in sorted(test.counts.items()):
+			print(f'{name:>22}: {count}')
+
+		for name, latencies in sorted(test.latencies.items()):
+			latencies.sort()
+			print(f'{name:>22}: p99 {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms, max {latencies[-1] * 1000:.3f} ms')
+
+		for error in test.errors[:20]:
+			print('ERROR:', error)
+
+		errors += test.errors
+
+	if errors:
+		sys.exit(1)
+
+	print('OK')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,260 @@
+# Fills a node with a seeded workload of organizations and orders for each chain size and measures transaction
+# admission, order lookups through the API, mining, loading from disk and syncing from local peers
+# Usage (from the backend directory): python -m benchmarks.node_suite [--sizes 1000 10000] [--output results.json]
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from benchmarks.workload import Workload
+from blockchain import Blockchain
+from network import Network
+from node import Node
+
+sizes = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6] # Transactions in the chain
+block_size = 1000 # Transactions mined into each block
+order_samples = 1000 # Order lookups per chain size
+peers = 2 # Local nodes serving the chain to sync from
+mining_workers = 1
+seed = 1
+
+def log(message: str):
+	# Results are written to stdout, so progress goes to stderr
+	print(message, file=sys.stderr, flush=True)
+
+def get_percentile(values: list[float], percentile: float) -> float:
+	values = sorted(values)
+	return values[min(int(len(values) * percentile), len(values) - 1)]
+
+class NodeSuite:
+	def __init__(self, size: int, block_cache_size: int = None):
+		self.size = size
+		self.block_cache_size = block_cache_size
+		self.workload = Workload(seed)
+		self.directory = tempfile.mkdtemp()
+
+		os.chdir(self.directory)
+		self.blockchain = Blockchain(mining_workers, block_cache_size)
+
+		# Only the proof of work is timed for the hash rate, not saving and indexing the block
+		self.pow_seconds = 0.0
+		proof_of_work = self.blockchain.proof_of_work
+
+		def timed_proof_of_work(block):
+			start = time.perf_counter()
+			proof = proof_of_work(block)
+			self.pow_seconds += time.perf_counter() - start
+			return proof
+
+		self.blockchain.proof_of_work = timed_proof_of_work
+
+	def fill(self) -> dict:
+		blockchain = self.blockchain
+		admitted = 0
+		rejected = 0
+		admission_seconds = 0.0
+		mine_times = []
+		hashes = 0
+
+		for tx in self.workload.create_organizations():
+			blockchain.add_new_transaction(tx)
+			self.workload.accept(tx)
+
+		blockchain.mine()
+
+		while admitted < self.size:
+			# Each transaction is generated after the previous one was accepted, so it sees the state it changed
+			for _ in range(min(block_size, self.size - admitted)):
+				tx = self.workload.next_transaction()
+
+				start = time.perf_counter()
+				is_added = blockchain.add_new_transaction(tx)
+				admission_seconds += time.perf_counter() - start
+
+				if is_added:
+					self.workload.accept(tx)
+					admitted += 1
+				else:
+					rejected += 1
+
+			start = time.perf_counter()
+			if not blockchain.mine():
+				raise RuntimeError('Mining failed')
+			mine_times.append(time.perf_counter() - start)
+
+			# Workers step through the nonces together, so the winning nonce is about the number of hashes tried
+			hashes += blockchain.last_block.nonce + 1
+
+		return {
+			'admission': {
+				'transactions': admitted,
+				'rejected': rejected,
+				'seconds': admission_seconds,
+				'transactions_per_second': admitted / admission_seconds
+			},
+			'mine': {
+				'blocks': len(mine_times),
+				'mean_ms': sum(mine_times) / len(mine_times) * 1000,
+				'p50_ms': get_percentile(mine_times, 0.5) * 1000,
+				'p99_ms': get_percentile(mine_times, 0.99) * 1000,
+				'hashes_per_second': hashes / self.pow_seconds
+			}
+		}
+
+	def measure_order_lookups(self) -> dict:
+		# The app is imported once inside a scratch directory and pointed at the filled chain
+		import main
+		main.blockchain = self.blockchain
+
+		client = main.app.test_client()
+		order_codes = [self.workload.rng.choice(self.workload.order_codes) for _ in range(order_samples)]
+		latencies = []
+
+		for order_code in order_codes:
+			start = time.perf_counter()
+			response = client.get(f'/order/{order_code}')
+			latencies.append(time.perf_counter() - start)
+
+			if response.status_code != 200:
+				raise RuntimeError(f'Order {order_code} was not found')
+
+		return {
+			'requests': len(latencies),
+			'p50_ms': get_percentile(latencies, 0.5) * 1000,
+			'p99_ms': get_percentile(latencies, 0.99) * 1000
+		}
+
+	def measure_load_from_disk(self) -> dict:
+		# Checkpoint at the tip first, so the measurement does not depend on where the last interval ended
+		with self.blockchain.write_lock:
+			self.blockchain.save_checkpoint(self.blockchain.create_checkpoint(), self.blockchain.snapshot)
+
+		start = time.perf_counter()
+		Blockchain(mining_workers, self.block_cache_size).store.close_maps()
+		with_checkpoint = time.perf_counter() - start
+
+		shutil.move(Blockchain.checkpoints_dir, 'checkpoints')
+		start = time.perf_counter()
+		Blockchain(mining_workers, self.block_cache_size).store.close_maps()
+		without_checkpoint = time.perf_counter() - start
+		shutil.move('checkpoints', Blockchain.checkpoints_dir)
+
+		return {
+			'with_checkpoint_seconds': with_checkpoint,
+			'without_checkpoint_seconds': without_checkpoint
+		}
+
+	def measure_resolve_conflicts(self) -> dict:
+		import main
+		main.blockchain = self.blockchain
+
+		# Requests of the peers are not logged
+		logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+		servers = [make_server('127.0.0.1', 0, main.app, threaded=True) for _ in range(peers)]
+		for server in servers:
+			threading.Thread(target=server.serve_forever, daemon=True).start()
+
+		# A new node with only its own genesis block downloads the whole chain
+		os.chdir(tempfile.mkdtemp(dir=self.directory))
+		try:
+			blockchain = Blockchain(mining_workers, self.block_cache_size)
+			network = Network()
+			network.fetch_deadline = 3600
+
+			for server in servers:
+				network.add_node(Node(f'127.0.0.1:{server.server_port}'))
+
+			start = time.perf_counter()
+			resolved = network.resolve_conflicts(blockchain)
+			seconds = time.perf_counter() - start
+		finally:
+			os.chdir(self.directory)
+
+			for server in servers:
+				server.shutdown()
+
+		if not resolved or len(blockchain.snapshot) != len(self.blockchain.snapshot):
+			raise RuntimeError('Chain was not synced from the peers')
+
+		return {
+			'peers': peers,
+			'blocks': len(blockchain.snapshot),
+			'seconds': seconds
+		}
+
+	def run(self) -> dict:
+		log(f'{self.size} transactions: filling the chain')
+		result = {'transactions': self.size}
+		result.update(self.fill())
+		result['blocks'] = len(self.blockchain.snapshot)
+
+		log(f'{self.size} transactions: order lookups')
+		result['order_lookup'] = self.measure_order_lookups()
+
+		log(f'{self.size} transactions: loading from disk')
+		result['load_from_disk'] = self.measure_load_from_disk()
+
+		log(f'{self.size} transactions: syncing from peers')
+		result['resolve_conflicts'] = self.measure_resolve_conflicts()
+
+		return result
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--sizes', type=int, nargs='+', default=sizes, help='Transactions in the chain for each run')
+	parser.add_argument('--block-cache-size', type=int, help='Keep only this many whole blocks in memory')
+	parser.add_argument('--output', help='Write the results to this file instead of stdout')
+	args = parser.parse_args()
+
+	working_directory = os.getcwd()
+	scratch_directory = tempfile.mkdtemp()
+	results = []
+
+	# The app creates its own node state when it is imported, which is kept out of the working directory
+	os.chdir(scratch_directory)
+	import main as _
+
+	try:
+		for size in args.sizes:
+			suite = NodeSuite(size, args.block_cache_size)
+
+			try:
+				results.append(suite.run())
+			finally:
+				os.chdir(scratch_directory)
+				shutil.rmtree(suite.directory, ignore_errors=True)
+	finally:
+		os.chdir(working_directory)
+		shutil.rmtree(scratch_directory, ignore_errors=True)
+
+	report = {
+		'config': {
+			'seed': seed,
+			'block_size': block_size,
+			'order_samples': order_samples,
+			'mining_workers': mining_workers,
+			'difficulty': Blockchain.difficulty,
+			'block_cache_size': args.block_cache_size,
+			'python': platform.python_version(),
+			'cpu_count': os.cpu_count()
+		},
+		'results': results
+	}
+
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(report, f, indent=2)
+	else:
+		print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,67 @@
+# Compares proof of work hashing speed with and without reusing the hash state of the static data
+# of legacy blocks, and with hashing only the Merkle root header of current blocks
+# Usage (from the backend directory): python -m benchmarks.pow_hashing
+import hashlib
+import time
+
+from block import Block
+
+block_sizes = [0, 10, 100, 1000, 5000] # Transactions per block
+duration = 1.0 # Seconds per measurement
+
+def make_transactions(count: int) -> list[dict]:
+	return [{
+		'timestamp': time.time_ns(),
+		'type': 2,
+		'created_by': hashlib.sha256(str(i).encode()).hexdigest(),
+		'data': {'status': 'in transit', 'note': 'x' * 50},
+		'prev_tx_id': hashlib.sha256(str(i + 1).encode()).hexdigest(),
+		'prev_tx_block_id': 1,
+		'tx_id': hashlib.sha256(str(i + 2).encode()).hexdigest(),
+		'order_code': hashlib.md5(str(i).encode()).hexdigest().upper()
+	} for i in range(count)]
+
+def full_hash_rate(block: Block, static_data: str) -> float:
+	block.nonce = 0
+	start = time.perf_counter()
+
+	while time.perf_counter() - start < duration:
+		for _ in range(100):
+			hashlib.sha256((static_data + str(block.nonce)).encode()).hexdigest()
+			block.nonce += 1
+
+	return block.nonce / (time.perf_counter() - start)
+
+def prefix_hash_rate(block: Block, static_data: str) -> float:
+	block.nonce = 0
+	start = time.perf_counter()
+	prefix_hash = block.get_prefix_hash(static_data)
+
+	while time.perf_counter() - start < duration:
+		for _ in range(100):
+			block.compute_hash_from_prefix(prefix_hash)
+			block.nonce += 1
+
+	return block.nonce / (time.perf_counter() - start)
+
+def main():
+	print(f'{"transactions":>12} {"static bytes":>12} {"full hashes/s":>14} {"prefix hashes/s":>16} {"speedup":>8} {"header hashes/s":>16}')
+
+	for size in block_sizes:
+		transactions = make_transactions(size)
+		block = Block(1, transactions, '0' * 64, version=Block.legacy_version)
+		static_data = block.get_static_data()
+
+		# Both ways of hashing must give the same result
+		assert block.compute_hash(static_data) == hashlib.sha256((static_data + str(block.nonce)).encode()).hexdigest()
+
+		full_rate = full_hash_rate(block, static_data)
+		prefix_rate = prefix_hash_rate(block, static_data)
+
+		header_block = Block(1, transactions, '0' * 64)
+		header_rate = prefix_hash_rate(header_block, header_block.get_static_data())
+
+		print(f'{size:>12} {len(static_data):>12} {full_rate:>14.0f} {prefix_rate:>16.0f} {prefix_rate / full_rate:>7.1f}x {header_rate:>16.0f}')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,65 @@
+import random
+
+from transaction.base_transaction import BaseTransaction
+from transaction.complete_order import CompleteOrder
+from transaction.create_order import CreateOrder
+from transaction.create_organization import CreateOrganization
+from transaction.transfer_order import TransferOrder
+from transaction.update_order import UpdateOrder
+
+class Workload:
+	# Seeded stream of valid transactions, orders are created, updated, transferred and completed by the organizations
+	# that own them, so the same seed always gives the same sequence of operations
+	order_mix = {'create': 0.35, 'update': 0.35, 'transfer': 0.15, 'complete': 0.15}
+	statuses = ['packed', 'shipped', 'in transit', 'delivered', 'delayed']
+
+	def __init__(self, seed: int, organizations: int = 20):
+		self.rng = random.Random(seed)
+		self.organizations = organizations
+
+		self.organization_ids: list[str] = []
+		self.order_codes: list[str] = [] # All created orders
+		self.open_orders: list[str] = [] # Orders that are not completed
+		self.open_positions: dict[str, int] = {} # Order code -> position in open orders
+		self.owners: dict[str, str] = {} # Order code -> organization that owns it
+
+	def create_organizations(self) -> list[CreateOrganization]:
+		return [CreateOrganization({'name': f'Organization {i}'}) for i in range(self.organizations)]
+
+	def next_transaction(self) -> BaseTransaction:
+		operations = list(self.order_mix)
+		operation = self.rng.choices(operations, weights=list(self.order_mix.values()))[0] if self.open_orders else 'create'
+
+		if operation == 'create':
+			return CreateOrder(self.rng.choice(self.organization_ids), {'item': self.rng.randrange(10000), 'quantity': self.rng.randint(1, 100)})
+
+		order_code = self.open_orders[self.rng.randrange(len(self.open_orders))]
+		owner = self.owners[order_code]
+
+		if operation == 'update':
+			return UpdateOrder(owner, {'status': self.rng.choice(self.statuses)}, order_code)
+
+		if operation == 'transfer':
+			return TransferOrder(owner, {'reason': 'handover'}, order_code, self.rng.choice(self.organization_ids))
+
+		return CompleteOrder(owner, {'status': 'delivered'}, order_code)
+
+	def accept(self, tx: BaseTransaction):
+		# Called for every transaction the node accepted, so later transactions are valid
+		if isinstance(tx, CreateOrganization):
+			self.organization_ids.append(tx.tx_id)
+		elif isinstance(tx, CreateOrder):
+			self.order_codes.append(tx.order_code)
+			self.open_positions[tx.order_code] = len(self.open_orders)
+			self.open_orders.append(tx.order_code)
+			self.owners[tx.order_code] = tx.created_by
+		elif isinstance(tx, TransferOrder):
+			self.owners[tx.order_code] = tx.new_owner
+		elif isinstance(tx, CompleteOrder):
+			# Replaced by the last open order so removing it does not depend on the number of orders
+			position = self.open_positions.pop(tx.order_code)
+			last_order = self.open_orders.pop()
+
+			if last_order != tx.order_code:
+				self.open_orders[position] = last_order
+				self.open_positions[last_order] = position
@@ -2,28 +2,89 @@ import hashlib
 import json
 import time
 
+from merkle_tree import MerkleTree
+from transaction.transaction_record import TransactionRecord
+
 class Block:
-	def __init__(self, index: int, transactions: list, prev_hash: str, timestamp: int = None, nonce: int = 0):
+	__slots__ = ('index', 'transactions', 'prev_hash', 'timestamp', 'nonce', 'version', 'merkle_root', 'hash')
+
+	# Version 1 blocks hash all transactions for every nonce, later versions only hash a header with their Merkle root
+	legacy_version = 1
+	latest_version = 2
+	versions = [1, 2]
+
+	def __init__(self, index: int, transactions: list, prev_hash: str, timestamp: int = None, nonce: int = 0, version: int = latest_version, merkle_root: str = None):
 		self.index = index
 		self.transactions = transactions
 		self.prev_hash = prev_hash
 		self.timestamp = timestamp or time.time_ns()
 		self.nonce = nonce
+		self.version = version
+		self.merkle_root = merkle_root
+
+	@property
+	def is_legacy(self) -> bool:
+		return self.version == self.legacy_version
+
+	def encode_transactions(self) -> str:
+		return '[' + ', '.join(TransactionRecord.encode(tx) for tx in self.transactions) + ']'
+
+	def compute_merkle_root(self) -> str:
+		return MerkleTree([TransactionRecord.encode(tx) for tx in self.transactions]).root
+
+	def get_merkle_root(self) -> str:
+		if self.merkle_root is None:
+			self.merkle_root = self.compute_merkle_root()
+
+		return self.merkle_root
+
+	def has_valid_merkle_root(self) -> bool:
+		return self.is_legacy or self.get_merkle_root() == self.compute_merkle_root()
 
 	def get_static_data(self) -> str:
-		return json.dumps({
+		# Same as json.dumps(..., sort_keys=True) but reuses the encoding of the transactions
+		if self.is_legacy:
+			return '{"index": ' + json.dumps(self.index) \
+				+ ', "prev_hash": ' + json.dumps(self.prev_hash) \
+				+ ', "timestamp": ' + json.dumps(self.timestamp) \
+				+ ', "transactions": ' + self.encode_transactions() + '}'
+
+		# Header of constant size which commits to the transactions through the Merkle root
+		return '{"index": ' + json.dumps(self.index) \
+			+ ', "merkle_root": ' + json.dumps(self.get_merkle_root()) \
+			+ ', "prev_hash": ' + json.dumps(self.prev_hash) \
+			+ ', "timestamp": ' + json.dumps(self.timestamp) \
+			+ ', "version": ' + json.dumps(self.version) + '}'
+
+	def compute_hash(self, static_data: str) -> str:
+		return self.compute_hash_from_prefix(self.get_prefix_hash(static_data))
+
+	def get_prefix_hash(self, static_data: str):
+		# Hash state of the static data which can be reused for every nonce
+		return hashlib.sha256(static_data.encode())
+
+	def compute_hash_from_prefix(self, prefix_hash) -> str:
+		block_hash = prefix_hash.copy()
+		block_hash.update(str(self.nonce).encode())
+		return block_hash.hexdigest()
+
+	def get_header(self) -> dict:
+		header = {
 			'index': self.index,
-			'transactions': self.transactions,
 			'prev_hash': self.prev_hash,
-			'timestamp': self.timestamp
-		}, sort_keys=True)
+			'timestamp': self.timestamp,
+			'nonce': self.nonce,
+			'hash': self.hash
+		}
 
-	def compute_hash(self, static_data: str) -> str:
-		block_string = static_data + str(self.nonce)
-		return hashlib.sha256(block_string.encode()).hexdigest()
+		if not self.is_legacy:
+			header['version'] = self.version
+			header['merkle_root'] = self.get_merkle_root()
+
+		return header
 
 	def to_dict(self) -> dict:
-		return {
+		data = {
 			'index': self.index,
 			'transactions': self.transactions,
 			'prev_hash': self.prev_hash,
@@ -32,14 +93,43 @@ class Block:
 			'hash': self.hash
 		}
 
+		# Legacy blocks keep their original format
+		if not self.is_legacy:
+			data['version'] = self.version
+			data['merkle_root'] = self.get_merkle_root()
+
+		return data
+
+	def to_json(self) -> str:
+		# Same as json.dumps(self.to_dict(), sort_keys=True)
+		if self.is_legacy:
+			return '{"hash": ' + json.dumps(self.hash) \
+				+ ', "index": ' + json.dumps(self.index) \
+				+ ', "nonce": ' + json.dumps(self.nonce) \
+				+ ', "prev_hash": ' + json.dumps(self.prev_hash) \
+				+ ', "timestamp": ' + json.dumps(self.timestamp) \
+				+ ', "transactions": ' + self.encode_transactions() + '}'
+
+		return '{"hash": ' + json.dumps(self.hash) \
+			+ ', "index": ' + json.dumps(self.index) \
+			+ ', "merkle_root": ' + json.dumps(self.get_merkle_root()) \
+			+ ', "nonce": ' + json.dumps(self.nonce) \
+			+ ', "prev_hash": ' + json.dumps(self.prev_hash) \
+			+ ', "timestamp": ' + json.dumps(self.timestamp) \
+			+ ', "transactions": ' + self.encode_transactions() \
+			+ ', "version": ' + json.dumps(self.version) + '}'
+
 	@staticmethod
 	def from_dict(data: dict):
+		# Blocks without a version were created before versions were introduced
 		block = Block(
 			index=data['index'],
-			transactions=data['transactions'],
+			transactions=[TransactionRecord.from_dict(tx) for tx in data['transactions']],
 			prev_hash=data['prev_hash'],
 			timestamp=data['timestamp'],
-			nonce=data['nonce']
+			nonce=data['nonce'],
+			version=data.get('version', Block.legacy_version),
+			merkle_root=data.get('merkle_root')
 		)
 		block.hash = data['hash']
 
@@ -0,0 +1,221 @@
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+from block import Block
+
+class BlockStore:
+	segment_size = 64 * 1024 * 1024 # Bytes after which a new segment file is started
+	migration_batch_size = 1000 # Legacy block files loaded at once during migration
+
+	record_header = struct.Struct('<II') # Block data length, CRC32 of block data
+	index_entry = struct.Struct('<IQI') # Segment number, record offset, record length
+
+	def __init__(self, directory: str, read_only: bool = False):
+		self.directory = directory
+		self.index_file = os.path.join(directory, 'index.dat')
+
+		self.index = bytearray() # In-memory copy of the index file, one entry per block
+		self.maps: dict[int, mmap.mmap] = {}
+		self.maps_lock = threading.RLock() # Blocks are read by several threads while others write
+		self.segment = None
+		self.segment_number = 0
+
+		# Read only stores are used by other processes and must not repair or change files
+		if read_only:
+			self.load_index()
+		else:
+			os.makedirs(directory, exist_ok=True)
+			self.recover()
+
+	@property
+	def height(self) -> int:
+		return len(self.index) // self.index_entry.size
+
+	def get_segment_path(self, segment_number: int) -> str:
+		return os.path.join(self.directory, f'segment_{segment_number:06d}.dat')
+
+	def get_segment_numbers(self) -> list[int]:
+		# Use pattern to match by file name segment_<number>.dat
+		name_pattern = re.compile(r'^segment_(\d+)\.dat$')
+
+		return sorted(int(match.group(1)) for match in map(name_pattern.match, os.listdir(self.directory)) if match)
+
+	def get_entry(self, block_index: int) -> tuple[int, int, int]:
+		return self.index_entry.unpack_from(self.index, block_index * self.index_entry.size)
+
+	def get_map(self, segment_number: int, end: int) -> mmap.mmap:
+		segment_map = self.maps.get(segment_number)
+
+		# Remap the segment if it has grown since it was mapped
+		if not segment_map or len(segment_map) < end:
+			if segment_map:
+				segment_map.close()
+
+			with open(self.get_segment_path(segment_number), 'rb') as f:
+				segment_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+			self.maps[segment_number] = segment_map
+
+		return segment_map
+
+	def close_maps(self):
+		with self.maps_lock:
+			for segment_map in self.maps.values():
+				segment_map.close()
+
+			self.maps = {}
+
+	def read_block(self, block_index: int) -> Block:
+		# Files are only shortened while holding the lock, so the entry is read and the record copied under it, a map
+		# of a file which was shortened would crash the process when it is read past the new end
+		with self.maps_lock:
+			if not 0 <= block_index < self.height:
+				raise ValueError(f'Block {block_index} is not stored')
+
+			segment_number, offset, length = self.get_entry(block_index)
+			record = self.get_map(segment_number, offset + length)[offset:offset + length]
+
+		data_length, checksum = self.record_header.unpack_from(record)
+		data = record[self.record_header.size:]
+
+		if data_length != len(data) or zlib.crc32(data) != checksum:
+			raise ValueError(f'Block {block_index} is corrupted')
+
+		return Block.from_dict(json.loads(data))
+
+	def is_valid_record(self, block_index: int) -> bool:
+		segment_number, offset, length = self.get_entry(block_index)
+		segment_path = self.get_segment_path(segment_number)
+
+		if not os.path.exists(segment_path) or os.path.getsize(segment_path) < offset + length:
+			return False
+
+		with open(segment_path, 'rb') as f:
+			f.seek(offset)
+			record = f.read(length)
+
+		data_length, checksum = self.record_header.unpack_from(record)
+		data = record[self.record_header.size:]
+
+		return data_length == len(data) and zlib.crc32(data) == checksum
+
+	def load_index(self):
+		if os.path.exists(self.index_file):
+			with open(self.index_file, 'rb') as f:
+				self.index = bytearray(f.read())
+
+		# Drop a partially written index entry
+		del self.index[self.height * self.index_entry.size:]
+
+	def recover(self):
+		self.load_index()
+
+		# Drop entries whose records were not fully written
+		while self.height and not self.is_valid_record(self.height - 1):
+			del self.index[-self.index_entry.size:]
+
+		self.discard_after(self.height)
+
+	def discard_after(self, height: int):
+		# Remove everything stored for blocks from the given height onwards, readers are blocked until no map or index
+		# entry points past the new end of a file
+		with self.maps_lock:
+			self.close_maps()
+			if self.segment:
+				self.segment.close()
+
+			if height:
+				segment_number, offset, length = self.get_entry(height - 1)
+				end = offset + length
+			else:
+				segment_number, end = 0, 0
+
+			# Shorten the index first so it never points at removed records
+			del self.index[height * self.index_entry.size:]
+			with open(self.index_file, 'ab') as f:
+				f.truncate(len(self.index))
+				self.sync(f)
+
+			for number in self.get_segment_numbers():
+				if number > segment_number:
+					os.remove(self.get_segment_path(number))
+
+			with open(self.get_segment_path(segment_number), 'ab') as f:
+				f.truncate(end)
+				self.sync(f)
+
+		# Reopen so that the write position is at the new end of the segment
+		self.segment_number = segment_number
+		self.segment = open(self.get_segment_path(segment_number), 'ab')
+
+	def truncate(self, height: int):
+		if height < self.height:
+			self.discard_after(height)
+
+	def append_blocks(self, blocks: list[Block]):
+		if not blocks:
+			return
+
+		entries = bytearray()
+
+		for block in blocks:
+			if self.segment.tell() >= self.segment_size:
+				self.sync(self.segment)
+				self.segment.close()
+
+				self.segment_number += 1
+				self.segment = open(self.get_segment_path(self.segment_number), 'ab')
+
+			data = block.to_json().encode()
+			record = self.record_header.pack(len(data), zlib.crc32(data)) + data
+
+			offset = self.segment.tell()
+			self.segment.write(record)
+			entries += self.index_entry.pack(self.segment_number, offset, len(record))
+
+		# Records have to be on disk before the index entries that point to them
+		self.sync(self.segment)
+
+		with open(self.index_file, 'ab') as f:
+			f.write(entries)
+			self.sync(f)
+
+		self.index += entries
+
+	def migrate_block_files(self, directory: str):
+		# Use pattern to match by file name block_<number>.json
+		name_pattern = re.compile(r'^block_(\d+)\.json$')
+
+		# Sort matching files by block number
+		block_files = sorted(
+			[i for i in os.listdir(directory) if name_pattern.match(i)], # Get file names that match the pattern
+			key=lambda x: int(x.split('_')[1].split('.')[0]) # Get block number
+		)
+
+		self.truncate(0)
+
+		for i in range(0, len(block_files), self.migration_batch_size):
+			blocks = []
+
+			for block_file in block_files[i:i + self.migration_batch_size]:
+				with open(os.path.join(directory, block_file), 'r') as f:
+					blocks.append(Block.from_dict(json.load(f)))
+
+			self.append_blocks(blocks)
+
+		# Old files are only removed once all blocks are safely stored
+		for block_file in block_files:
+			os.remove(os.path.join(directory, block_file))
+
+			if os.path.exists(os.path.join(directory, block_file + '.old')):
+				os.remove(os.path.join(directory, block_file + '.old'))
+
+	@staticmethod
+	def sync(f):
+		f.flush()
+		os.fsync(f.fileno())
@@ -1,82 +1,203 @@
+from collections import OrderedDict
 import os
-import json
-import re
+import struct
+import threading
+import time
 
 from transaction.base_transaction import BaseTransaction
+from transaction.transaction_record import TransactionRecord
 from block import Block
+from block_store import BlockStore
+from chain_index import ChainIndex
+from checkpoint import Checkpoint
+from chain_snapshot import ChainSnapshot
+from fair_lock import FairLock
+from lazy_chain import LazyChain
+from mempool import Mempool
+from merkle_tree import MerkleTree
+from metrics import Metrics
+from miner import Miner
+from read_write_lock import ReadWriteLock
 
 class Blockchain:
 	difficulty = 2
-
-	def __init__(self):
-		self.chain: list[Block] = []
-		self.pending_transactions = []
+	blocks_dir = 'data/blocks'
+	checkpoints_dir = 'data/checkpoints'
+	verified_cache_transactions = 100000 # Transactions in the blocks from other nodes remembered as verified
+	nonce_buckets = [4 ** i for i in range(2, 13)] # Nonces tried before a proof was found
+
+	def __init__(self, mining_workers: int = None, block_cache_size: int = None, mempool: Mempool = None, checkpoint_interval: int = None, metrics: Metrics = None):
+		# Keep only block headers in memory and cache this many whole blocks if set
+		self.block_cache_size = block_cache_size
+		# Save the derived state of the chain every this many blocks if set
+		self.checkpoint_interval = checkpoint_interval
+		self.checkpoint_height = 0
+		self.checkpoint_lock = threading.Lock()
+
+		self.chain: list[Block]|LazyChain = []
+		self.mempool = mempool if mempool is not None else Mempool()
+		self.chain_index = ChainIndex()
+		self.miner = Miner(mining_workers)
+
+		self.metrics = metrics if metrics is not None else Metrics()
+		self.metrics.add_counter('blockchain_transactions_total', 'Transactions received by result')
+		self.metrics.add_histogram('blockchain_transaction_validation_seconds', 'Time spent validating a new transaction')
+		self.metrics.add_histogram('blockchain_proof_of_work_seconds', 'Time spent searching for the proof of work of a block')
+		self.metrics.add_histogram('blockchain_proof_of_work_nonces', 'Nonces tried before the proof of work was found', self.nonce_buckets)
+		self.metrics.add_histogram('blockchain_save_to_disk_seconds', 'Time spent writing blocks to the block store')
+		self.metrics.add_gauge('blockchain_height', 'Number of blocks in the chain', lambda: len(self.snapshot))
+		self.metrics.add_gauge('mempool_transactions', 'Pending transactions', lambda: len(self.mempool))
+		self.metrics.add_gauge('mempool_bytes', 'Size of the pending transactions', lambda: self.mempool.bytes)
+
+		# Changes are made by one writer at a time, the chain index and mempool are only changed while holding the state lock
+		# for writing and are read while holding it for reading, the chain itself is read from snapshots without locking
+		self.write_lock = FairLock()
+		self.state_lock = ReadWriteLock()
+		self.snapshot: ChainSnapshot = None
+
+		# (index, hash) -> verified block which does not have to be hashed again, the cache is bounded by the transactions
+		# of its blocks so large blocks do not fill the memory
+		self.verified_blocks: OrderedDict[tuple[int, str], Block] = OrderedDict()
+		self.verified_transactions = 0
+		self.verified_lock = threading.Lock()
 
 		os.makedirs('data', exist_ok=True)
+		self.store = BlockStore(self.blocks_dir)
+
+		if self.block_cache_size:
+			self.chain = LazyChain(self.store, self.block_cache_size)
+
+		# Move blocks saved as one file per block into the block store
 		if os.path.exists('data/block_0.json'):
+			self.store.migrate_block_files('data')
+
+		if self.store.height:
 			self.load_from_disk() # Load existing chain if it exists
 		else:
 			self.create_genesis_block()
 
+		self.update_snapshot()
+
 	def create_genesis_block(self):
 		genesis_block = Block(0, [], '0')
 		genesis_block.hash = genesis_block.compute_hash(genesis_block.get_static_data())
 		self.chain.append(genesis_block)
+		self.chain_index.add_block(genesis_block)
 		self.save_to_disk()
 
+	def update_snapshot(self):
+		self.snapshot = ChainSnapshot(self.chain, len(self.chain))
+
 	@property
 	def last_block(self) -> Block:
 		return self.chain[-1]
 
 	def add_new_transaction(self, tx: BaseTransaction) -> bool:
-		if not tx.validate(self.chain, self.pending_transactions):
-			return False
+		with self.write_lock:
+			tx_data = self.prepare_transaction(tx)
+			if not tx_data:
+				return False
 
-		tx.tx_id = tx.generate_tx_id()
-		self.pending_transactions.append(tx.to_dict())
+			with self.state_lock.write():
+				self.add_to_mempool(tx_data)
 
-		return True
+			return True
 
-	def get_order_all_transactions(self, order_code: str) -> list[dict]:
-		tx_list = []
+	def add_new_transactions(self, transactions: list[BaseTransaction]) -> list[bool]:
+		# Transactions are validated in order so each one sees the ones accepted before it, which means each accepted one
+		# has to be added before the next is validated, readers are blocked for the whole batch so they never see a part of it
+		with self.write_lock, self.state_lock.write():
+			results = []
 
-		# 1 - CreateOrder, 2 - UpdateOrder, 3 - TransferOrder, 4 - CompleteOrder
+			for tx in transactions:
+				tx_data = self.prepare_transaction(tx)
+				if tx_data:
+					self.add_to_mempool(tx_data)
 
-		# Find first transaction with the given order code
-		for tx in reversed(self.pending_transactions):
-			if tx['type'] in [1, 2, 3, 4] and tx['order_code'] == order_code:
-				tx_list.append(tx)
-				break
+				results.append(bool(tx_data))
 
-		if tx_list:
-			# If found in pending transactions, check if there are any more
-			for tx in reversed(self.pending_transactions):
-				if tx['type'] in [1, 2, 3, 4] and tx['tx_id'] == tx_list[-1]['prev_tx_id']:
-					tx_list.append(tx)
-		else:
-			for block in reversed(self.chain):
-				for tx in reversed(block.transactions):
-					if tx['type'] in [1, 2, 3, 4] and tx['order_code'] == order_code:
-						tx_list.append(tx)
-						break
-		
-		if not tx_list:
+			return results
+
+	def prepare_transaction(self, tx: BaseTransaction) -> TransactionRecord:
+		# Returns the record of a valid transaction which fits into the mempool, None otherwise
+		with self.metrics.time('blockchain_transaction_validation_seconds'):
+			is_valid = tx.validate(self)
+
+		if not is_valid:
+			self.metrics.increment('blockchain_transactions_total', {'result': 'invalid'})
+			return None
+
+		tx_data = tx.to_record()
+		tx.tx_id = tx_data.assign_tx_id()
+
+		# Fields which are not checked by the validation, like the new owner, have to be usable by the chain index
+		if not ChainIndex.is_valid_record(tx_data):
+			self.metrics.increment('blockchain_transactions_total', {'result': 'invalid'})
+			return None
+
+		# New transactions are rejected while the mempool is full
+		if not self.mempool.has_room(tx_data):
+			self.metrics.increment('blockchain_transactions_total', {'result': 'mempool_full'})
+			return None
+
+		self.metrics.increment('blockchain_transactions_total', {'result': 'accepted'})
+		return tx_data
+
+	def add_to_mempool(self, tx_data: TransactionRecord):
+		# Called while holding the state lock for writing, the transaction is indexed where it is planned before it is
+		# added to the mempool, so a failure leaves neither changed
+		block_number, position = self.mempool.get_planned_location(tx_data)
+		self.chain_index.add_transaction(tx_data, block_number, position)
+		self.mempool.add(tx_data)
+
+	def get_block_transactions(self, block_index: int) -> list[dict]:
+		# Pending transactions are indexed by the number of the block they are planned for
+		if Mempool.is_block_number(block_index):
+			return self.mempool.blocks[self.mempool.get_block_offset(block_index)]
+
+		return self.chain[block_index].transactions
+
+	def get_planned_index(self, block_index: int) -> int:
+		# Index the block of an indexed transaction has or would get if the mempool was mined now
+		if Mempool.is_block_number(block_index):
+			return self.last_block.index + 1 + self.mempool.get_block_offset(block_index)
+
+		return block_index
+
+	def get_transaction(self, tx_id: str) -> tuple[dict, int]:
+		block_index, position = self.chain_index.get_transaction_location(tx_id)
+		if block_index is None:
+			return None, None
+
+		return self.get_block_transactions(block_index)[position], block_index
+
+	def get_inclusion_proof(self, block_index: int, position: int) -> list[dict]:
+		# Legacy blocks have no Merkle root, so None is returned for them
+		block = self.chain[block_index]
+		if block.is_legacy:
+			return None
+
+		return MerkleTree([TransactionRecord.encode(tx) for tx in block.transactions]).get_proof(position)
+
+	def get_order_all_transactions(self, order_code: str) -> list[dict]:
+		# Find the latest transaction with the given order code
+		order = self.chain_index.get_order(order_code)
+		if not order:
 			return []
 
-		# Find any remaining transactions by using prev_tx_block_id and prev_tx_id
+		tx_list = [self.get_block_transactions(order['block_index'])[order['position']]]
+
+		# Find any remaining transactions by following prev_tx_id
 		last_tx = tx_list[-1]
-		found_tx = True
-		while 'prev_tx_block_id' in last_tx and last_tx['prev_tx_block_id'] and found_tx:
-			found_block = self.chain[last_tx['prev_tx_block_id']]
-			found_tx = False
-
-			# Find transaction with the given prev_tx_id in the found block
-			for tx in reversed(found_block.transactions):
-				if tx['type'] in [1, 2, 3, 4] and tx['tx_id'] == last_tx['prev_tx_id']:
-					tx_list.append(tx)
-					last_tx = tx
-					found_tx = True
-					break
+		while last_tx['prev_tx_id']:
+			prev_tx, _ = self.get_transaction(last_tx['prev_tx_id'])
+
+			# 1 - CreateOrder, 2 - UpdateOrder, 3 - TransferOrder, 4 - CompleteOrder
+			if not prev_tx or prev_tx['type'] not in [1, 2, 3, 4]:
+				break
+
+			tx_list.append(prev_tx)
+			last_tx = prev_tx
 
 		return tx_list
 
@@ -84,21 +205,23 @@ class Blockchain:
 	def is_valid_proof(proof: str) -> bool:
 		return proof.startswith('0' * Blockchain.difficulty)
 
-	@staticmethod
-	def proof_of_work(block: Block) -> str:
-		static_data = block.get_static_data()
-
-		block.nonce = 0
-		proof = block.compute_hash(static_data)
+	def proof_of_work(self, block: Block) -> str:
+		# Returns None if mining was cancelled
+		start = time.perf_counter()
+		proof = self.miner.proof_of_work(block, Blockchain.difficulty)
 
-		while not Blockchain.is_valid_proof(proof):
-			block.nonce += 1
-			proof = block.compute_hash(static_data)
+		if proof:
+			# Workers step through the nonces together, so the winning nonce is about the number of nonces tried
+			self.metrics.observe('blockchain_proof_of_work_seconds', time.perf_counter() - start)
+			self.metrics.observe('blockchain_proof_of_work_nonces', block.nonce + 1)
 
 		return proof
 
 	@staticmethod
 	def is_valid_block(block: Block, prev_block: Block, proof: str) -> bool:
+		if type(block.version) is not int or block.version not in Block.versions:
+			return False
+
 		if prev_block.index + 1 != block.index:
 			return False
 
@@ -108,36 +231,181 @@ class Blockchain:
 		if not Blockchain.is_valid_proof(proof):
 			return False
 
+		# Only the header is hashed, so the transactions have to match its Merkle root
+		if not block.has_valid_merkle_root():
+			return False
+
 		return proof == block.compute_hash(block.get_static_data())
 
-	def add_block(self, block: Block, proof: str) -> bool:
-		if not Blockchain.is_valid_block(block, self.last_block, proof):
-			return False
+	def add_block(self, block: Block, proof: str, mined: bool = False) -> bool:
+		# Mined blocks contain the transactions of the next block of the mempool
+		with self.write_lock:
+			if not Blockchain.is_valid_block(block, self.last_block, proof):
+				return False
 
-		block.hash = proof
-		self.chain.append(block)
-		self.save_to_disk(block.index)
-		return True
+			block.hash = proof
 
-	def mine(self) -> int|bool:
-		if not self.pending_transactions:
+			# Appending to the block store does not change the blocks readers can see
+			self.save_to_disk(block.index, [block])
+
+			with self.state_lock.write():
+				self.chain.append(block)
+
+				if mined:
+					# Pending transactions are already indexed and only get their location in the chain
+					for position, tx in enumerate(block.transactions):
+						self.chain_index.move_transaction(tx, block.index, position)
+
+					self.mempool.pop_block()
+				else:
+					self.chain_index.add_block(block)
+
+				self.update_snapshot()
+
+			self.save_checkpoint_if_due()
+			return True
+
+	def add_received_block(self, block: Block) -> bool:
+		# Blocks from other nodes may contain pending transactions or change the same orders, only those transactions
+		# are planned again, the others keep their planned blocks, which are numbered independently of the chain
+		with self.write_lock:
+			if not Blockchain.is_valid_block(block, self.last_block, block.hash):
+				return False
+
+			if not all(ChainIndex.is_valid_record(tx) for tx in block.transactions):
+				return False
+
+			# A block with exactly the transactions planned next is added like a block mined by this node
+			if self.is_planned_block(block):
+				self.miner.cancel()
+				return self.add_block(block, block.hash, mined=True)
+
+			conflicting = self.get_conflicting_transactions(block)
+			if not self.chain_index.is_valid_replacement(conflicting, block.transactions):
+				return False
+
+			# A block being mined on top of the old tip is no longer useful
+			self.miner.cancel()
+			self.save_to_disk(block.index, [block])
+
+			with self.state_lock.write():
+				self.remove_from_index(conflicting)
+				self.mempool.remove({tx['tx_id'] for tx in conflicting})
+
+				self.chain.append(block)
+				self.chain_index.add_block(block)
+
+				self.restore_transactions(conflicting)
+				self.update_snapshot()
+
+			self.save_checkpoint_if_due()
+			return True
+
+	def is_planned_block(self, block: Block) -> bool:
+		planned_transactions = self.mempool.get_block(0)
+		if len(planned_transactions) != len(block.transactions):
 			return False
 
-		last_block = self.last_block
-		new_block = Block(
-			index=last_block.index + 1,
-			transactions=self.pending_transactions,
-			prev_hash=last_block.hash
-		)
+		return all(TransactionRecord.encode(tx) == TransactionRecord.encode(planned_tx) for tx, planned_tx in zip(block.transactions, planned_transactions))
 
-		proof = self.proof_of_work(new_block)
+	def get_conflicting_transactions(self, block: Block) -> list[dict]:
+		# Pending transactions which are in the block and all pending transactions of the orders the block changes, in
+		# the order they were planned
+		conflicting = {}
+		order_codes = set()
 
-		self.add_block(new_block, proof)
-		self.pending_transactions = []
-		return new_block.index
+		for tx in block.transactions:
+			pending_tx = self.get_pending_transaction(tx['tx_id'])
+			if pending_tx:
+				conflicting[pending_tx['tx_id']] = pending_tx
 
-	@staticmethod
-	def is_valid_chain(chain: list[Block]) -> bool:
+				if pending_tx['type'] in [1, 2, 3, 4]:
+					order_codes.add(pending_tx['order_code'])
+
+			# 1 - CreateOrder, 2 - UpdateOrder, 3 - TransferOrder, 4 - CompleteOrder
+			if tx['type'] in [1, 2, 3, 4]:
+				order_codes.add(tx['order_code'])
+
+		for order_code in order_codes:
+			order = self.chain_index.get_order(order_code)
+			tx_id = order['tx_id'] if order else None
+
+			# Pending transactions of an order follow its last transaction in the chain
+			while tx_id:
+				pending_tx = self.get_pending_transaction(tx_id)
+				if not pending_tx:
+					break
+
+				conflicting[tx_id] = pending_tx
+				tx_id = pending_tx['prev_tx_id'] if pending_tx['type'] in [2, 3, 4] else None
+
+		return sorted(conflicting.values(), key=lambda tx: self.chain_index.get_transaction_location(tx['tx_id']))
+
+	def get_pending_transaction(self, tx_id: str) -> dict:
+		# Transactions in the chain are not read, with a block cache they may have to be loaded from the block store
+		block_index, position = self.chain_index.get_transaction_location(tx_id)
+		if block_index is None or not Mempool.is_block_number(block_index):
+			return None
+
+		return self.get_block_transactions(block_index)[position]
+
+	def mine(self) -> int|bool:
+		with self.write_lock:
+			if not self.mempool:
+				return False
+
+			last_block = self.last_block
+			new_block = Block(
+				index=last_block.index + 1,
+				transactions=self.mempool.seal_block(),
+				prev_hash=last_block.hash
+			)
+
+		# Other changes are not blocked while searching for the proof, the transactions go back to the mempool if the
+		# block is not added for any reason
+		is_added = False
+		try:
+			proof = self.proof_of_work(new_block)
+
+			with self.write_lock:
+				is_added = bool(proof) and self.add_block(new_block, proof, mined=True)
+		finally:
+			if not is_added:
+				with self.write_lock:
+					self.mempool.unseal_block()
+
+		return new_block.index if is_added else False
+
+	def get_verified_block(self, block: Block) -> Block:
+		with self.verified_lock:
+			verified_block = self.verified_blocks.get((block.index, block.hash))
+			if verified_block:
+				self.verified_blocks.move_to_end((block.index, block.hash))
+				return verified_block
+
+		# Blocks in our own chain have already been verified
+		snapshot = self.snapshot
+		if block.index < len(snapshot) and snapshot.get_block_hash(block.index) == block.hash:
+			return snapshot[block.index]
+
+		return None
+
+	def add_verified_block(self, block: Block):
+		with self.verified_lock:
+			replaced_block = self.verified_blocks.pop((block.index, block.hash), None)
+			if replaced_block:
+				self.verified_transactions -= len(replaced_block.transactions)
+
+			self.verified_blocks[(block.index, block.hash)] = block
+			self.verified_transactions += len(block.transactions)
+
+			# The latest block is kept even if it is larger than the whole cache
+			while len(self.verified_blocks) > 1 and self.verified_transactions > self.verified_cache_transactions:
+				_, removed_block = self.verified_blocks.popitem(last=False)
+				self.verified_transactions -= len(removed_block.transactions)
+
+	def is_valid_chain_cached(self, chain: list[Block]) -> bool:
+		# Blocks which are identical to already verified blocks are not hashed again
 		if not chain:
 			return False
 
@@ -145,39 +413,171 @@ class Blockchain:
 			current_block = chain[i]
 			prev_block = chain[i - 1]
 
+			verified_block = self.get_verified_block(current_block)
+			if verified_block and verified_block.to_dict() == current_block.to_dict():
+				if prev_block.index + 1 != current_block.index or prev_block.hash != current_block.prev_hash:
+					return False
+
+				continue
+
 			proof = current_block.hash
 			if not Blockchain.is_valid_block(current_block, prev_block, proof):
 				return False
 
+			self.add_verified_block(current_block)
+
 		return True
 
-	def replace_chain(self, chain: list[Block]):
-		self.chain = chain
-		self.save_to_disk()
+	def get_header(self, index: int) -> dict:
+		if isinstance(self.chain, LazyChain):
+			return self.chain.get_header(index)
+
+		return self.chain[index].get_header()
 
-	def save_to_disk(self, from_index: int = 0):
-		for block in self.chain[from_index:]:
-			block_file = f'data/block_{block.index}.json'
+	def get_block_hash(self, index: int) -> str:
+		return self.get_header(index)['hash']
 
-			if os.path.exists(block_file):
-				os.replace(block_file, block_file + '.old')
+	def remove_from_index(self, transactions: list[dict], chain_index: ChainIndex = None):
+		chain_index = chain_index or self.chain_index
 
-			with open(block_file, 'w') as f:
-				json.dump(block.to_dict(), f)
+		for tx in reversed(transactions):
+			prev_tx = None
+
+			# 2 - UpdateOrder, 3 - TransferOrder, 4 - CompleteOrder
+			if tx['type'] in [2, 3, 4]:
+				prev_tx, _ = self.get_transaction(tx['prev_tx_id'])
+
+			chain_index.remove_transaction(tx, prev_tx)
+
+	def replace_blocks(self, fork_point: int, new_blocks: list[Block]) -> bool:
+		with self.write_lock:
+			# The chain may have changed since the new blocks were validated against it
+			if fork_point > len(self.chain) or fork_point + len(new_blocks) <= len(self.chain):
+				return False
+
+			if fork_point and self.get_block_hash(fork_point - 1) != new_blocks[0].prev_hash:
+				return False
+
+			# Nothing is changed unless all transactions of the new blocks can be indexed in place of the old ones
+			old_blocks = self.chain[fork_point:]
+			old_transactions = [tx for block in old_blocks for tx in block.transactions]
+			new_transactions = [tx for block in new_blocks for tx in block.transactions]
+			if not self.chain_index.is_valid_replacement(old_transactions + list(self.mempool), new_transactions):
+				return False
+
+			# A block being mined on top of the old chain is no longer useful
+			self.miner.cancel()
+
+			# Readers of a chain kept in memory never read the block store and a lazy chain takes the blocks it replaces
+			# from the retired ones, so the store is changed before readers are blocked
+			is_lazy = isinstance(self.chain, LazyChain)
+			if is_lazy:
+				self.chain.retire(old_blocks)
+
+			self.save_to_disk(fork_point, new_blocks)
+
+			with self.state_lock.write():
+				self.remove_from_index(list(self.mempool))
+				for block in reversed(old_blocks):
+					self.remove_from_index(block.transactions)
+
+				if is_lazy:
+					self.chain.truncate(fork_point)
+
+					for block in new_blocks:
+						self.chain.append(block)
+				else:
+					# A new list is used so that snapshots keep the blocks they were taken with
+					self.chain = self.chain[:fork_point] + new_blocks
+
+				for block in new_blocks:
+					self.chain_index.add_block(block)
+
+				self.restore_mempool()
+				self.update_snapshot()
+
+			self.save_checkpoint_if_due()
+			return True
+
+	def restore_mempool(self):
+		transactions = list(self.mempool)
+		self.mempool.clear()
+		self.restore_transactions(transactions)
+
+	def restore_transactions(self, transactions: list[dict]):
+		for tx in transactions:
+			# Evict transactions which are already in the chain or whose previous transaction no longer exists
+			if not self.chain_index.is_valid_transaction(tx):
+				continue
+
+			if tx['prev_tx_id'] and self.chain_index.get_transaction_location(tx['prev_tx_id'])[0] is None:
+				continue
+
+			self.add_to_mempool(tx)
+
+	def save_to_disk(self, from_index: int = 0, blocks: list[Block] = None):
+		# Save the given blocks or the blocks of the chain starting from the given index
+		with self.metrics.time('blockchain_save_to_disk_seconds'):
+			self.store.truncate(from_index)
+			self.store.append_blocks(self.chain[from_index:] if blocks is None else blocks)
+
+	def create_checkpoint(self) -> Checkpoint:
+		# Pending transactions are not part of the chain, so they are removed from a copy of the index, headers are added
+		# when the checkpoint is saved
+		chain_index = self.chain_index.copy()
+		self.remove_from_index(list(self.mempool), chain_index)
+
+		return Checkpoint(len(self.chain), self.last_block.hash, None, chain_index)
+
+	def save_checkpoint_if_due(self):
+		# Called by the writer after the chain has grown, checkpoints are saved in the background
+		if not self.checkpoint_interval or len(self.chain) < self.checkpoint_height + self.checkpoint_interval:
+			return
+
+		checkpoint = self.create_checkpoint()
+		self.checkpoint_height = checkpoint.height
+
+		threading.Thread(target=self.save_checkpoint, args=(checkpoint, self.snapshot), daemon=True).start()
+
+	def save_checkpoint(self, checkpoint: Checkpoint, snapshot: ChainSnapshot):
+		# Headers are taken from the snapshot so that the writer does not wait for them
+		checkpoint.headers = [snapshot.get_header(i) for i in range(checkpoint.height)]
+
+		with self.checkpoint_lock:
+			checkpoint.save(self.checkpoints_dir)
+
+	def load_checkpoint(self) -> Checkpoint:
+		# Use the latest checkpoint whose tip is still in the stored chain
+		for height in reversed(Checkpoint.get_heights(self.checkpoints_dir)):
+			if height > self.store.height:
+				continue
+
+			checkpoint = Checkpoint.load(self.checkpoints_dir, height)
+
+			try:
+				if checkpoint and self.store.read_block(height - 1).hash == checkpoint.tip_hash:
+					return checkpoint
+			except (ValueError, OSError, struct.error):
+				continue
+
+		return None
 
 	def load_from_disk(self):
-		self.chain = []
+		checkpoint = self.load_checkpoint()
 
-		# Use pattern to match by file name block_<number>.json
-		name_pattern = re.compile(r'^block_(\d+)\.json$')
+		if self.block_cache_size:
+			self.chain = LazyChain(self.store, self.block_cache_size)
+			self.chain.load(checkpoint.headers if checkpoint else None)
+		else:
+			self.chain = [self.store.read_block(i) for i in range(self.store.height)]
 
-		# Sort matching files by block number
-		block_files = sorted(
-			[i for i in os.listdir('data') if name_pattern.match(i)], # Get file names that match the pattern
-			key=lambda x: int(x.split('_')[1].split('.')[0]) # Get block number
-		)
+		if not checkpoint:
+			self.chain_index.rebuild(self.chain)
+			return
 
-		for block_file in block_files:
-			with open(f'data/{block_file}', 'r') as f:
-				block = Block.from_dict(json.load(f))
-				self.chain.append(block)
+		# Only blocks after the checkpoint have to be indexed
+		self.chain_index = checkpoint.chain_index
+		self.checkpoint_height = checkpoint.height
+
+		for block in self.chain[checkpoint.height:]:
+			self.chain_index.add_block(block)
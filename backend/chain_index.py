@@ -0,0 +1,204 @@
+from block import Block
+from transaction.transaction_record import OrderRecord, TransactionRecord, TransferOrderRecord
+
+class ChainIndex:
+	# Status of an order after each type of transaction
+	order_statuses = {1: 'created', 2: 'updated', 3: 'transferred', 4: 'completed'}
+	# Record class of each type of transaction
+	record_classes = {0: TransactionRecord, 1: OrderRecord, 2: OrderRecord, 3: TransferOrderRecord, 4: OrderRecord}
+
+	def __init__(self):
+		# Transaction ID -> (block index or number of the planned block of a pending transaction, position in block)
+		self.transactions: dict[str, tuple[int, int]] = {}
+		# Order code -> current state of the order and location of its latest transaction
+		self.orders: dict[str, dict] = {}
+		# Organization ID -> codes of the orders it currently owns, dicts keep them in the order they were received
+		self.owner_orders: dict[str, dict[str, None]] = {}
+
+	def add_transaction(self, tx: dict, block_index: int, position: int):
+		self.transactions[tx['tx_id']] = (block_index, position)
+
+		# 1 - CreateOrder, 2 - UpdateOrder, 3 - TransferOrder, 4 - CompleteOrder
+		if tx['type'] in [1, 2, 3, 4]:
+			self.set_order(tx, block_index, position)
+
+	def set_order(self, tx: dict, block_index: int, position: int):
+		owner = tx['new_owner'] if tx['type'] == 3 else tx['created_by']
+		order = self.orders.get(tx['order_code'])
+
+		if order and order['owner'] != owner:
+			self.remove_owner_order(order['owner'], tx['order_code'])
+
+		self.owner_orders.setdefault(owner, {})[tx['order_code']] = None
+
+		self.orders[tx['order_code']] = {
+			'tx_id': tx['tx_id'],
+			'type': tx['type'],
+			'owner': owner,
+			'block_index': block_index,
+			'position': position
+		}
+
+	def move_transaction(self, tx: dict, block_index: int, position: int):
+		# Pending transactions keep the state of their order when their planned block is added to the chain
+		self.transactions[tx['tx_id']] = (block_index, position)
+
+		if tx['type'] in [1, 2, 3, 4]:
+			order = self.orders.get(tx['order_code'])
+
+			if order and order['tx_id'] == tx['tx_id']:
+				self.orders[tx['order_code']] = dict(order, block_index=block_index, position=position)
+
+	def remove_owner_order(self, owner: str, order_code: str):
+		orders = self.owner_orders.get(owner, {})
+		orders.pop(order_code, None)
+
+		if not orders:
+			self.owner_orders.pop(owner, None)
+
+	def remove_order(self, order_code: str):
+		order = self.orders.pop(order_code, None)
+		if order:
+			self.remove_owner_order(order['owner'], order_code)
+
+	def remove_transaction(self, tx: dict, prev_tx: dict):
+		# Transactions indexed before they were validated may have no previous transaction in the index
+		self.transactions.pop(tx['tx_id'], None)
+
+		# 1 - CreateOrder, 2 - UpdateOrder, 3 - TransferOrder, 4 - CompleteOrder
+		if tx['type'] == 1:
+			self.remove_order(tx['order_code'])
+		elif tx['type'] in [2, 3, 4]:
+			# Order goes back to the state after its previous transaction
+			if prev_tx and prev_tx['type'] in [1, 2, 3, 4] and prev_tx['tx_id'] in self.transactions:
+				block_index, position = self.transactions[prev_tx['tx_id']]
+				self.set_order(prev_tx, block_index, position)
+			else:
+				self.remove_order(tx['order_code'])
+
+	@staticmethod
+	def is_valid_record(tx: dict) -> bool:
+		# Fields used as keys of the index have to be strings, the owner of an organization and the previous transaction
+		# of an organization are not used
+		tx_type = tx['type'] if isinstance(tx, TransactionRecord) else None
+		if type(tx_type) is not int or type(tx) is not ChainIndex.record_classes.get(tx_type):
+			return False
+
+		if not isinstance(tx['tx_id'], str):
+			return False
+
+		if tx_type == 0:
+			return True
+
+		if not all(isinstance(tx[key], str) for key in ['created_by', 'prev_tx_id', 'order_code']):
+			return False
+
+		return tx_type != 3 or isinstance(tx['new_owner'], str)
+
+	def is_valid_transaction(self, tx: dict, tx_ids: dict[str, bool] = None, order_tx_ids: dict[str, str] = None) -> bool:
+		# Checks that the transaction can be indexed and rolled back again, changes which are not in the index yet are
+		# given as whether each changed transaction is indexed and the latest transaction of each changed order
+		if not self.is_valid_record(tx):
+			return False
+
+		tx_id = tx['tx_id']
+		if tx_ids and tx_id in tx_ids:
+			if tx_ids[tx_id]:
+				return False
+		elif tx_id in self.transactions:
+			return False
+
+		if tx['type'] == 0:
+			return True
+
+		if order_tx_ids and tx['order_code'] in order_tx_ids:
+			order_tx_id = order_tx_ids[tx['order_code']]
+		else:
+			order = self.orders.get(tx['order_code'])
+			order_tx_id = order['tx_id'] if order else None
+
+		# Orders are created once, later transactions continue from the latest transaction of the order
+		if tx['type'] == 1:
+			return order_tx_id is None
+
+		return order_tx_id is not None and order_tx_id == tx['prev_tx_id']
+
+	def is_valid_replacement(self, removed: list[dict], added: list[dict]) -> bool:
+		# Checks that the added transactions can be indexed after the removed ones were rolled back, without changing
+		# the index
+		tx_ids: dict[str, bool] = {}
+		order_tx_ids: dict[str, str] = {}
+
+		for tx in reversed(removed):
+			tx_ids[tx['tx_id']] = False
+
+			if tx['type'] == 1:
+				order_tx_ids[tx['order_code']] = None
+			elif tx['type'] in [2, 3, 4]:
+				prev_tx_id = tx['prev_tx_id']
+				is_indexed = tx_ids[prev_tx_id] if prev_tx_id in tx_ids else prev_tx_id in self.transactions
+				order_tx_ids[tx['order_code']] = prev_tx_id if is_indexed else None
+
+		for tx in added:
+			if not self.is_valid_transaction(tx, tx_ids, order_tx_ids):
+				return False
+
+			tx_ids[tx['tx_id']] = True
+			if tx['type'] in [1, 2, 3, 4]:
+				order_tx_ids[tx['order_code']] = tx['tx_id']
+
+		return True
+
+	def add_block(self, block: Block):
+		for position, tx in enumerate(block.transactions):
+			self.add_transaction(tx, block.index, position)
+
+	def get_transaction_location(self, tx_id: str) -> tuple[int, int]:
+		return self.transactions.get(tx_id, (None, None))
+
+	def get_order(self, order_code: str) -> dict:
+		return self.orders.get(order_code)
+
+	def get_owner_orders(self, owner: str, status: str = None) -> list[str]:
+		# Open orders are all orders that are not completed
+		order_codes = self.owner_orders.get(owner, {})
+		if not status:
+			return list(order_codes)
+
+		if status == 'open':
+			return [code for code in order_codes if self.orders[code]['type'] != 4]
+
+		return [code for code in order_codes if self.order_statuses[self.orders[code]['type']] == status]
+
+	def copy(self) -> 'ChainIndex':
+		# States of orders are replaced and never changed, so only the dicts holding them are copied
+		index = ChainIndex()
+		index.transactions = dict(self.transactions)
+		index.orders = dict(self.orders)
+		index.owner_orders = {owner: dict(order_codes) for owner, order_codes in self.owner_orders.items()}
+
+		return index
+
+	def to_dict(self) -> dict:
+		return {
+			'transactions': self.transactions,
+			'orders': self.orders,
+			'owner_orders': {owner: list(order_codes) for owner, order_codes in self.owner_orders.items()}
+		}
+
+	@staticmethod
+	def from_dict(data: dict) -> 'ChainIndex':
+		index = ChainIndex()
+		index.transactions = {tx_id: tuple(location) for tx_id, location in data['transactions'].items()}
+		index.orders = data['orders']
+		index.owner_orders = {owner: dict.fromkeys(order_codes) for owner, order_codes in data['owner_orders'].items()}
+
+		return index
+
+	def rebuild(self, chain: list[Block]):
+		self.transactions = {}
+		self.orders = {}
+		self.owner_orders = {}
+
+		for block in chain:
+			self.add_block(block)
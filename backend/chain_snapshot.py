@@ -0,0 +1,60 @@
+from block import Block
+from lazy_chain import LazyChain
+
+class ChainSnapshot:
+	# Read only view of the chain as it was when the snapshot was taken
+	def __init__(self, chain: list[Block]|LazyChain, length: int):
+		# Chains are only appended to in place, removing blocks replaces the list, so the first length blocks never change
+		self.chain = chain
+		self.length = length
+		self.headers = chain.headers if isinstance(chain, LazyChain) else None
+
+	@property
+	def last_block(self) -> Block:
+		return self.get_block(self.length - 1)
+
+	def get_block(self, index: int) -> Block:
+		if self.headers is None:
+			return self.chain[index]
+
+		# Blocks of a lazy chain are read from the block store which is changed when blocks are replaced
+		try:
+			block = self.chain.get_block(index) if index < len(self.chain) else None
+		except (IndexError, RuntimeError):
+			block = None
+
+		if not block or block.hash != self.headers[index]['hash']:
+			block = self.chain.get_retired_block(self.headers[index]['hash'])
+
+		if not block:
+			raise RuntimeError(f'Block {index} was replaced after the snapshot was taken')
+
+		return block
+
+	def get_header(self, index: int) -> dict:
+		if self.headers is None:
+			return self.chain[index].get_header()
+
+		return self.headers[index]
+
+	def get_block_hash(self, index: int) -> str:
+		return self.get_header(index)['hash']
+
+	def __len__(self) -> int:
+		return self.length
+
+	def __getitem__(self, key: int|slice) -> Block|list[Block]:
+		if isinstance(key, slice):
+			return [self.get_block(i) for i in range(*key.indices(len(self)))]
+
+		if key < 0:
+			key += len(self)
+
+		if not 0 <= key < len(self):
+			raise IndexError('Chain index out of range')
+
+		return self.get_block(key)
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self.get_block(i)
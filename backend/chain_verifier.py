@@ -0,0 +1,60 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import struct
+
+from block_store import BlockStore
+from blockchain import Blockchain
+from miner import get_process_context
+
+def verify_range(blocks_dir: str, start: int, end: int) -> int:
+	# Returns the index of the first invalid block in the range or None if all are valid
+	store = BlockStore(blocks_dir, read_only=True)
+	prev_block = None
+	i = start - 1
+
+	try:
+		if start:
+			prev_block = store.read_block(i)
+
+		for i in range(start, end):
+			block = store.read_block(i)
+
+			if block.index != i:
+				return i
+
+			if prev_block and not Blockchain.is_valid_block(block, prev_block, block.hash):
+				return i
+
+			prev_block = block
+	except (ValueError, OSError, struct.error):
+		# Block could not be read
+		return i
+	finally:
+		store.close_maps()
+
+	return None
+
+class ChainVerifier:
+	chunk_size = 1000 # Blocks verified by a worker at once
+
+	def __init__(self, workers: int = None):
+		self.workers = workers or os.cpu_count() or 1
+		self.context = get_process_context()
+
+	def verify_store(self, blocks_dir: str, height: int) -> int:
+		# Returns the index of the first invalid block or None if the whole chain is valid
+		with ProcessPoolExecutor(max_workers=self.workers, mp_context=self.context) as executor:
+			futures = [
+				executor.submit(verify_range, blocks_dir, start, min(start + self.chunk_size, height))
+				for start in range(0, height, self.chunk_size)
+			]
+
+			# Chunks are checked in order so the first invalid block is found first
+			for future in futures:
+				invalid_index = future.result()
+
+				if invalid_index is not None:
+					executor.shutdown(cancel_futures=True)
+					return invalid_index
+
+		return None
@@ -0,0 +1,72 @@
+import json
+import os
+import re
+
+from chain_index import ChainIndex
+
+class Checkpoint:
+	# Derived state of the chain up to a height, startup only has to replay the blocks after the latest valid checkpoint
+	max_checkpoints = 2 # Older checkpoints are kept in case the latest one no longer matches the chain
+
+	def __init__(self, height: int, tip_hash: str, headers: list[dict], chain_index: ChainIndex):
+		self.height = height
+		self.tip_hash = tip_hash
+		self.headers = headers
+		self.chain_index = chain_index
+
+	def to_dict(self) -> dict:
+		return {
+			'height': self.height,
+			'tip_hash': self.tip_hash,
+			'headers': self.headers,
+			'chain_index': self.chain_index.to_dict()
+		}
+
+	@staticmethod
+	def from_dict(data: dict) -> 'Checkpoint':
+		return Checkpoint(data['height'], data['tip_hash'], data['headers'], ChainIndex.from_dict(data['chain_index']))
+
+	def is_valid(self) -> bool:
+		return self.height > 0 and len(self.headers) == self.height and self.headers[-1]['hash'] == self.tip_hash
+
+	@staticmethod
+	def get_path(directory: str, height: int) -> str:
+		return os.path.join(directory, f'checkpoint_{height:09d}.json')
+
+	@staticmethod
+	def get_heights(directory: str) -> list[int]:
+		if not os.path.isdir(directory):
+			return []
+
+		# Use pattern to match by file name checkpoint_<height>.json
+		name_pattern = re.compile(r'^checkpoint_(\d+)\.json$')
+
+		return sorted(int(match.group(1)) for match in map(name_pattern.match, os.listdir(directory)) if match)
+
+	def save(self, directory: str):
+		os.makedirs(directory, exist_ok=True)
+		path = self.get_path(directory, self.height)
+
+		# Written to a temporary file first so a crash never leaves a partial checkpoint behind
+		with open(path + '.tmp', 'w') as f:
+			json.dump(self.to_dict(), f)
+			f.flush()
+			os.fsync(f.fileno())
+
+		os.replace(path + '.tmp', path)
+
+		for height in self.get_heights(directory)[:-self.max_checkpoints]:
+			os.remove(self.get_path(directory, height))
+
+	@staticmethod
+	def load(directory: str, height: int) -> 'Checkpoint':
+		try:
+			with open(Checkpoint.get_path(directory, height), 'r') as f:
+				checkpoint = Checkpoint.from_dict(json.load(f))
+		except (OSError, ValueError, KeyError, TypeError):
+			return None
+
+		if checkpoint.height != height or not checkpoint.is_valid():
+			return None
+
+		return checkpoint
@@ -0,0 +1,43 @@
+import threading
+
+class FairLock:
+	# Reentrant lock which is given out in the order it was requested, so busy threads can not starve others
+	def __init__(self):
+		self.condition = threading.Condition()
+		self.owner: int = None
+		self.depth = 0
+		self.next_ticket = 0
+		self.serving_ticket = 0
+
+	def acquire(self):
+		thread_id = threading.get_ident()
+
+		with self.condition:
+			if self.owner == thread_id:
+				self.depth += 1
+				return
+
+			ticket = self.next_ticket
+			self.next_ticket += 1
+
+			while self.owner is not None or self.serving_ticket != ticket:
+				self.condition.wait()
+
+			self.owner = thread_id
+			self.depth = 1
+
+	def release(self):
+		with self.condition:
+			self.depth -= 1
+
+			if not self.depth:
+				self.owner = None
+				self.serving_ticket += 1
+				self.condition.notify_all()
+
+	def __enter__(self):
+		self.acquire()
+		return self
+
+	def __exit__(self, *_):
+		self.release()
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+import struct
+import threading
+
+from block import Block
+from block_store import BlockStore
+
+class LazyChain:
+	def __init__(self, store: BlockStore, cache_size: int, blocks: list[Block] = None):
+		self.store = store
+		self.cache_size = cache_size
+
+		# Only block headers stay in memory, whole blocks are kept in a LRU cache
+		self.headers: list[dict] = []
+		self.cache: OrderedDict[int, Block] = OrderedDict()
+		self.cache_lock = threading.Lock() # The cache is changed by readers too
+
+		# Blocks which were removed from the chain, kept by hash for snapshots taken before they were removed
+		self.retired: OrderedDict[str, Block] = OrderedDict()
+
+		for block in blocks or []:
+			self.append(block)
+
+	def load(self, headers: list[dict] = None):
+		# Only blocks after the given headers are read from the block store
+		self.headers = list(headers or [])
+		self.cache = OrderedDict()
+
+		for i in range(len(self.headers), self.store.height):
+			self.headers.append(self.store.read_block(i).get_header())
+
+	def get_header(self, index: int) -> dict:
+		return self.headers[index]
+
+	def cache_block(self, block: Block):
+		with self.cache_lock:
+			self.cache[block.index] = block
+			self.cache.move_to_end(block.index)
+
+			while len(self.cache) > self.cache_size:
+				self.cache.popitem(last=False)
+
+	def append(self, block: Block):
+		self.headers.append(block.get_header())
+		self.cache_block(block)
+
+	def truncate(self, height: int):
+		# A new list is used so that snapshots keep the headers they were taken with
+		self.headers = self.headers[:height]
+
+		with self.cache_lock:
+			for index in [i for i in self.cache if i >= height]:
+				del self.cache[index]
+
+	def retire(self, blocks: list[Block]):
+		# All blocks of the latest replacement are kept, they are read until the headers are replaced
+		with self.cache_lock:
+			for block in blocks:
+				self.retired[block.hash] = block
+
+			while len(self.retired) > max(self.cache_size, len(blocks)):
+				self.retired.popitem(last=False)
+
+	def get_retired_block(self, block_hash: str) -> Block:
+		with self.cache_lock:
+			return self.retired.get(block_hash)
+
+	def get_block(self, index: int) -> Block:
+		# The block store is changed before the headers when blocks are replaced, so blocks are checked against the
+		# headers and replaced blocks are taken from the retired ones until then
+		block_hash = self.headers[index]['hash']
+
+		with self.cache_lock:
+			block = self.cache.get(index)
+
+			if block and block.hash == block_hash:
+				self.cache.move_to_end(index)
+				return block
+
+		try:
+			block = self.store.read_block(index)
+		except (ValueError, OSError, struct.error):
+			block = None
+
+		if block and block.hash == block_hash:
+			self.cache_block(block)
+			return block
+
+		block = self.get_retired_block(block_hash)
+		if not block:
+			raise RuntimeError(f'Block {index} is not in the block store')
+
+		return block
+
+	def __len__(self) -> int:
+		return len(self.headers)
+
+	def __getitem__(self, key: int|slice) -> Block|list[Block]:
+		if isinstance(key, slice):
+			return [self.get_block(i) for i in range(*key.indices(len(self)))]
+
+		if key < 0:
+			key += len(self)
+
+		if not 0 <= key < len(self):
+			raise IndexError('Chain index out of range')
+
+		return self.get_block(key)
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self.get_block(i)
+
+	def __reversed__(self):
+		for i in reversed(range(len(self))):
+			yield self.get_block(i)
@@ -1,23 +1,81 @@
 import os
+import time
 
+from block import Block
 from blockchain import Blockchain
+from chain_index import ChainIndex
+from chain_verifier import ChainVerifier
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request, Response
+from flask import Flask, g, jsonify, request, Response
+from mempool import Mempool
+from metrics import Metrics
+from mining_scheduler import MiningScheduler
 from network import Network
 from node import Node
+from transaction.base_transaction import BaseTransaction
 from transaction.complete_order import CompleteOrder
 from transaction.create_order import CreateOrder
 from transaction.create_organization import CreateOrganization
+from transaction.transaction_record import TransactionRecord
 from transaction.transfer_order import TransferOrder
 from transaction.update_order import UpdateOrder
 
 load_dotenv(override=True)
 port = os.getenv('PORT') or 5000
+mining_workers = int(os.getenv('MINING_WORKERS') or os.cpu_count())
+block_cache_size = int(os.getenv('BLOCK_CACHE_SIZE') or 0) # Load blocks lazily if set
+checkpoint_interval = int(os.getenv('CHECKPOINT_INTERVAL') or 1000) # Blocks between checkpoints of the derived state
+verify_on_startup = os.getenv('VERIFY_CHAIN_ON_STARTUP') == '1'
+
+mempool = Mempool(
+	max_transactions=int(os.getenv('MEMPOOL_MAX_TRANSACTIONS') or 0),
+	max_bytes=int(os.getenv('MEMPOOL_MAX_BYTES') or 0),
+	max_block_transactions=int(os.getenv('BLOCK_MAX_TRANSACTIONS') or 0),
+	max_block_bytes=int(os.getenv('BLOCK_MAX_BYTES') or 0)
+)
+
+# Blocks are mined automatically once the next block has this many transactions, bytes or waited this many milliseconds
+mine_after_transactions = int(os.getenv('MINE_AFTER_TRANSACTIONS') or 0)
+mine_after_bytes = int(os.getenv('MINE_AFTER_BYTES') or 0)
+mine_after_ms = int(os.getenv('MINE_AFTER_MS') or 0)
+
+max_headers_per_request = 2000
+max_blocks_per_request = 100
+max_transactions_per_batch = 1000
+max_orders_per_request = 1000
 
 app = Flask(__name__)
 
-blockchain = Blockchain()
-network = Network()
+metrics = Metrics()
+metrics.add_counter('http_requests_total', 'HTTP requests by route, method and status')
+metrics.add_histogram('http_request_duration_seconds', 'Time spent handling HTTP requests by route')
+
+blockchain = Blockchain(mining_workers, block_cache_size, mempool, checkpoint_interval, metrics)
+network = Network(metrics)
+chain_verifier = ChainVerifier(mining_workers)
+mining_scheduler = MiningScheduler(blockchain, mine_after_transactions, mine_after_bytes, mine_after_ms, network.announce_block)
+
+if verify_on_startup:
+	invalid_index = chain_verifier.verify_store(Blockchain.blocks_dir, blockchain.store.height)
+
+	if invalid_index is not None:
+		raise RuntimeError(f'Stored chain is invalid from block {invalid_index}')
+
+mining_scheduler.start()
+
+@app.before_request
+def start_request_timer():
+	g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response: Response) -> Response:
+	# Routes are recorded by their rule so that order codes and other values do not each create new series
+	route = request.url_rule.rule if request.url_rule else 'unmatched'
+
+	metrics.observe('http_request_duration_seconds', time.perf_counter() - g.request_start, {'route': route})
+	metrics.increment('http_requests_total', {'route': route, 'method': request.method, 'status': response.status_code})
+
+	return response
 
 def check_missing_fields(data: dict, required_fields: list[str]) -> str:
 	missing_fields = [field for field in required_fields if field not in data]
@@ -27,29 +85,163 @@ def check_missing_fields(data: dict, required_fields: list[str]) -> str:
 
 	return ''
 
+def check_string_fields(data: dict, string_fields: list[str]) -> str:
+	invalid_fields = [field for field in string_fields if not isinstance(data[field], str)]
+
+	if invalid_fields:
+		return 'Fields must be strings: ' + ', '.join(invalid_fields)
+
+	return ''
+
+def create_batch_transaction(data: dict) -> tuple[BaseTransaction, str]:
+	# Items are checked before the batch is added, so a malformed item is rejected on its own
+	operation = data.get('operation')
+
+	if operation == 'createOrganization':
+		message = check_missing_fields(data, ['data'])
+		return (None, message) if message else (CreateOrganization(data['data']), '')
+
+	if operation == 'createOrder':
+		message = check_missing_fields(data, ['createdBy', 'data']) or check_string_fields(data, ['createdBy'])
+		return (None, message) if message else (CreateOrder(data['createdBy'], data['data']), '')
+
+	if operation == 'updateOrder':
+		message = check_missing_fields(data, ['createdBy', 'data', 'orderCode']) or check_string_fields(data, ['createdBy', 'orderCode'])
+		return (None, message) if message else (UpdateOrder(data['createdBy'], data['data'], data['orderCode']), '')
+
+	if operation == 'transferOrder':
+		message = check_missing_fields(data, ['createdBy', 'data', 'orderCode', 'newOwner']) \
+			or check_string_fields(data, ['createdBy', 'orderCode', 'newOwner'])
+		return (None, message) if message else (TransferOrder(data['createdBy'], data['data'], data['orderCode'], data['newOwner']), '')
+
+	if operation == 'completeOrder':
+		message = check_missing_fields(data, ['createdBy', 'data', 'orderCode']) or check_string_fields(data, ['createdBy', 'orderCode'])
+		return (None, message) if message else (CompleteOrder(data['createdBy'], data['data'], data['orderCode']), '')
+
+	return None, 'Invalid operation'
+
+def get_range_args(length: int, max_limit: int = None) -> tuple[int, int]:
+	start = request.args.get('from', 0, type=int)
+	limit = request.args.get('limit', max_limit, type=int)
+
+	if start < 0 or (limit is not None and limit < 0):
+		return None, None
+
+	if max_limit is not None:
+		limit = min(limit, max_limit)
+
+	return start, length if limit is None else min(start + limit, length)
+
 @app.route('/chain', methods=['GET'])
 def chain_get() -> tuple[Response, int]:
-	chain_data = []
+	# Blocks are read from a snapshot so mining and chain replacement never change a response while it is streamed
+	snapshot = blockchain.snapshot
+
+	start, end = get_range_args(len(snapshot))
+	if start is None:
+		return jsonify({'message': 'Invalid range'}), 400
+
+	# Blocks are serialized one at a time so the whole chain is never built in memory
+	def generate_blocks():
+		for i in range(start, end):
+			yield snapshot[i].to_json()
+
+	# One block per line
+	if request.args.get('format') == 'ndjson':
+		return Response((block + '\n' for block in generate_blocks()), mimetype='application/x-ndjson'), 200
+
+	def generate_response():
+		yield '{"chain": ['
 
-	for block in blockchain.chain:
-		chain_data.append(block.__dict__)
+		for i, block in enumerate(generate_blocks()):
+			yield (', ' if i else '') + block
+
+		yield '], "length": ' + str(len(snapshot)) + '}'
+
+	return Response(generate_response(), mimetype='application/json'), 200
+
+@app.route('/chain/tip', methods=['GET'])
+def chain_get_tip() -> tuple[Response, int]:
+	snapshot = blockchain.snapshot
+
+	response = {
+		'hash': snapshot.last_block.hash,
+		'length': len(snapshot)
+	}
+
+	return jsonify(response), 200
+
+@app.route('/chain/headers', methods=['GET'])
+def chain_get_headers() -> tuple[Response, int]:
+	snapshot = blockchain.snapshot
+
+	start, end = get_range_args(len(snapshot), max_headers_per_request)
+	if start is None:
+		return jsonify({'message': 'Invalid range'}), 400
+
+	response = {
+		'headers': [snapshot.get_header(i) for i in range(start, end)],
+		'length': len(snapshot)
+	}
+
+	return jsonify(response), 200
+
+@app.route('/chain/blocks', methods=['GET'])
+def chain_get_blocks() -> tuple[Response, int]:
+	snapshot = blockchain.snapshot
+
+	start, end = get_range_args(len(snapshot), max_blocks_per_request)
+	if start is None:
+		return jsonify({'message': 'Invalid range'}), 400
+
+	# Blocks reuse the encoding of their transactions
+	blocks = ', '.join(block.to_json() for block in snapshot[start:end])
+	response = '{"blocks": [' + blocks + '], "length": ' + str(len(snapshot)) + '}'
+
+	return Response(response, mimetype='application/json'), 200
+
+@app.route('/chain/verify', methods=['POST'])
+def chain_verify() -> tuple[Response, int]:
+	length = blockchain.store.height
+	invalid_index = chain_verifier.verify_store(Blockchain.blocks_dir, length)
 
 	response = {
-		'chain': chain_data,
-		'length': len(chain_data)
+		'valid': invalid_index is None,
+		'invalidIndex': invalid_index,
+		'length': length
 	}
 
 	return jsonify(response), 200
 
 @app.route('/mine', methods=['POST'])
 def mine_block()  -> tuple[Response, int]:
-	block_index = blockchain.mine()
-
-	if not block_index:
+	if not blockchain.mempool:
 		return jsonify({'message': 'No transactions to mine'}), 409
 
-	mined_block = blockchain.chain[block_index]
-	return jsonify(mined_block.to_dict()), 201
+	# Mining happens in the background, its progress is available from /mine/<job_id>
+	job = mining_scheduler.request_block()
+
+	return jsonify({'jobID': job['id'], 'status': job['status']}), 202
+
+@app.route('/mine/<job_id>', methods=['GET'])
+def mine_status(job_id: str) -> tuple[Response, int]:
+	job = mining_scheduler.get_job(job_id)
+
+	if not job:
+		return jsonify({'message': 'Job not found'}), 404
+
+	response = {
+		'jobID': job['id'],
+		'status': job['status'],
+		'blockIndex': job['block_index'],
+		'message': job['message']
+	}
+
+	return jsonify(response), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_get() -> tuple[Response, int]:
+	return Response(metrics.to_text(), mimetype='text/plain; version=0.0.4'), 200
 
 @app.route('/node/id', methods=['GET'])
 def node_get_id() -> tuple[Response, int]:
@@ -86,6 +278,35 @@ def node_get_registered() -> tuple[Response, int]:
 
 	return jsonify(response), 200
 
+@app.route('/block/announce', methods=['POST'])
+def block_announce() -> tuple[Response, int]:
+	data = request.get_json()
+
+	message = check_missing_fields(data, ['block', 'nodeID'])
+	if message:
+		return jsonify({'message': message}), 400
+
+	try:
+		block = Block.from_dict(data['block'])
+	except (KeyError, TypeError, ValueError):
+		block = None
+
+	if not block or type(block.index) is not int or type(block.hash) is not str:
+		return jsonify({'message': 'Invalid block'}), 400
+
+	status = network.receive_block(blockchain, block, data['nodeID'])
+
+	if status == 'added':
+		return jsonify({'message': 'Block added'}), 201
+
+	if status == 'known':
+		return jsonify({'message': 'Block already known'}), 200
+
+	if status == 'syncing':
+		return jsonify({'message': 'Syncing with the node'}), 202
+
+	return jsonify({'message': 'Block rejected'}), 409
+
 @app.route('/node/resolve', methods=['POST'])
 def node_resolve_conflicts() -> tuple[Response, int]:
 	if not network.nodes:
@@ -103,12 +324,72 @@ def order_check(order_code: str) -> tuple[Response, int]:
 	if not order_code:
 		return jsonify({'message': 'Order code is missing'}), 400
 
-	data = blockchain.get_order_all_transactions(order_code)
+	with blockchain.state_lock.read():
+		data = blockchain.get_order_all_transactions(order_code)
 
 	if not data:
 		return jsonify({'message': 'Order not found'}), 404
 
-	return jsonify(data), 200
+	# Transactions reuse their cached encoding
+	response = '[' + ', '.join(TransactionRecord.encode(tx) for tx in data) + ']'
+
+	return Response(response, mimetype='application/json'), 200
+
+@app.route('/order/<order_code>/proof', methods=['GET'])
+def order_proof(order_code: str) -> tuple[Response, int]:
+	# Index of a block whose hash the client already trusts, headers after it are not needed to link the blocks
+	trusted_index = request.args.get('trusted', type=int)
+	if trusted_index is not None and trusted_index < 0:
+		return jsonify({'message': 'Invalid trusted block'}), 400
+
+	# The chain index, mempool and chain are read together so they have to be consistent
+	with blockchain.state_lock.read():
+		data = blockchain.get_order_all_transactions(order_code)
+
+		if not data:
+			return jsonify({'message': 'Order not found'}), 404
+
+		transactions = []
+		pending_transactions = []
+		headers = {}
+
+		for tx in data:
+			block_index, position = blockchain.chain_index.get_transaction_location(tx['tx_id'])
+
+			# Pending transactions are not in a block yet so they can not be proven
+			if Mempool.is_block_number(block_index):
+				pending_transactions.append(dict(tx))
+				continue
+
+			entry = {'transaction': dict(tx), 'blockIndex': block_index, 'position': position}
+			proof = blockchain.get_inclusion_proof(block_index, position)
+
+			# Transactions in legacy blocks are proven by all transactions of the block instead
+			if proof is None:
+				entry['blockTransactions'] = [dict(block_tx) for block_tx in blockchain.chain[block_index].transactions]
+			else:
+				entry['proof'] = proof
+
+			transactions.append(entry)
+
+		# Headers from the oldest block with a transaction up to the tip link the blocks to a tip hash the client trusts,
+		# or up to the trusted block if all transactions are in blocks before it
+		if transactions:
+			end = len(blockchain.chain)
+			if trusted_index is not None and transactions[0]['blockIndex'] <= trusted_index < end:
+				end = trusted_index + 1
+
+			for block_index in range(transactions[-1]['blockIndex'], end):
+				headers[str(block_index)] = blockchain.get_header(block_index)
+
+	response = {
+		'orderCode': order_code,
+		'transactions': transactions,
+		'pendingTransactions': pending_transactions,
+		'headers': headers
+	}
+
+	return jsonify(response), 200
 
 @app.route('/order/new', methods=['POST'])
 def order_new() -> tuple[Response, int]:
@@ -170,6 +451,41 @@ def order_complete() -> tuple[Response, int]:
 
 	return jsonify(tx.to_json_format()), 201
 
+@app.route('/transaction/batch', methods=['POST'])
+def transaction_batch() -> tuple[Response, int]:
+	data = request.get_json()
+
+	message = check_missing_fields(data, ['transactions'])
+	if message:
+		return jsonify({'message': message}), 400
+
+	if not isinstance(data['transactions'], list) or len(data['transactions']) > max_transactions_per_batch:
+		return jsonify({'message': f'Transactions must be a list of at most {max_transactions_per_batch} items'}), 400
+
+	results = [None] * len(data['transactions'])
+	positions = []
+	transactions = []
+
+	for i, item in enumerate(data['transactions']):
+		tx, message = create_batch_transaction(item) if isinstance(item, dict) else (None, 'Invalid transaction')
+
+		if not tx:
+			results[i] = {'status': 400, 'message': message}
+			continue
+
+		positions.append(i)
+		transactions.append(tx)
+
+	added = blockchain.add_new_transactions(transactions)
+
+	for i, tx, is_added in zip(positions, transactions, added):
+		if is_added:
+			results[i] = {'status': 201, 'transaction': tx.to_json_format()}
+		else:
+			results[i] = {'status': 409, 'message': 'Transaction is not valid'}
+
+	return jsonify({'results': results}), 200
+
 @app.route('/organization/create', methods=['POST'])
 def organization_create() -> tuple[Response, int]:
 	data = request.get_json()
@@ -185,5 +501,43 @@ def organization_create() -> tuple[Response, int]:
 
 	return jsonify(tx.to_json_format()), 201
 
+@app.route('/organization/<organization_id>/orders', methods=['GET'])
+def organization_orders(organization_id: str) -> tuple[Response, int]:
+	status = request.args.get('status')
+	if status and status != 'open' and status not in ChainIndex.order_statuses.values():
+		return jsonify({'message': 'Invalid status'}), 400
+
+	with blockchain.state_lock.read():
+		# 0 - CreateOrganization
+		organization, _ = blockchain.get_transaction(organization_id)
+		if not organization or organization['type'] != 0:
+			return jsonify({'message': 'Organization not found'}), 404
+
+		order_codes = blockchain.chain_index.get_owner_orders(organization_id, status)
+
+		start, end = get_range_args(len(order_codes), max_orders_per_request)
+		if start is None:
+			return jsonify({'message': 'Invalid range'}), 400
+
+		orders = []
+		for order_code in order_codes[start:end]:
+			order = blockchain.chain_index.get_order(order_code)
+
+			orders.append({
+				'orderCode': order_code,
+				'owner': order['owner'],
+				'status': ChainIndex.order_statuses[order['type']],
+				'lastTxID': order['tx_id'],
+				'blockIndex': blockchain.get_planned_index(order['block_index']),
+				'pending': Mempool.is_block_number(order['block_index'])
+			})
+
+	response = {
+		'orders': orders,
+		'length': len(order_codes)
+	}
+
+	return jsonify(response), 200
+
 if __name__ == '__main__':
 	app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,145 @@
+from bisect import bisect_left
+import time
+
+from transaction.transaction_record import TransactionRecord
+
+class Mempool:
+	max_transactions = 100000
+	max_bytes = 64 * 1024 * 1024
+	max_block_transactions = 1000
+	max_block_bytes = 1024 * 1024
+	# Planned blocks are numbered from here so their numbers are never indexes of blocks in the chain, a planned block
+	# keeps its number when blocks are added before it
+	first_block_number = 2 ** 48
+
+	def __init__(self, max_transactions: int = None, max_bytes: int = None, max_block_transactions: int = None, max_block_bytes: int = None):
+		self.max_transactions = max_transactions or self.max_transactions
+		self.max_bytes = max_bytes or self.max_bytes
+		self.max_block_transactions = max_block_transactions or self.max_block_transactions
+		self.max_block_bytes = max_block_bytes or self.max_block_bytes
+		self.next_block_number = self.first_block_number
+
+		self.clear()
+
+	def clear(self):
+		# Pending transactions are planned into the next blocks in the order they were added
+		self.blocks: list[list[dict]] = []
+		self.block_numbers: list[int] = []
+		self.block_bytes: list[int] = []
+		self.block_times: list[float] = [] # When the first transaction of each block was added
+		self.sealed = False # Whether the first block is being mined and must not change
+
+		self.count = 0
+		self.bytes = 0
+
+		self.append_block()
+
+	def append_block(self):
+		self.blocks.append([])
+		self.block_numbers.append(self.next_block_number)
+		self.block_bytes.append(0)
+		self.block_times.append(None)
+		self.next_block_number += 1
+
+	def __len__(self) -> int:
+		return self.count
+
+	def __iter__(self):
+		for transactions in self.blocks:
+			yield from transactions
+
+	@staticmethod
+	def is_block_number(block_index: int) -> bool:
+		return block_index >= Mempool.first_block_number
+
+	@staticmethod
+	def get_size(tx: dict) -> int:
+		return len(TransactionRecord.encode(tx))
+
+	def has_room(self, tx: dict) -> bool:
+		return self.count < self.max_transactions and self.bytes + self.get_size(tx) <= self.max_bytes
+
+	def get_planned_location(self, tx: dict) -> tuple[int, int]:
+		# Number of the planned block and position the transaction would get if it was added now
+		size = self.get_size(tx)
+
+		last_transactions = self.blocks[-1]
+		if (self.sealed and len(self.blocks) == 1) or (last_transactions and (
+			len(last_transactions) >= self.max_block_transactions or self.block_bytes[-1] + size > self.max_block_bytes
+		)):
+			return self.next_block_number, 0
+
+		return self.block_numbers[-1], len(last_transactions)
+
+	def add(self, tx: dict) -> tuple[int, int]:
+		# Returns the number of the planned block and the position of the transaction in it
+		size = self.get_size(tx)
+
+		if self.get_planned_location(tx)[0] == self.next_block_number:
+			self.append_block()
+
+		if not self.blocks[-1]:
+			self.block_times[-1] = time.monotonic()
+
+		self.blocks[-1].append(tx)
+		self.block_bytes[-1] += size
+		self.count += 1
+		self.bytes += size
+
+		return self.block_numbers[-1], len(self.blocks[-1]) - 1
+
+	def get_block(self, offset: int) -> list[dict]:
+		return self.blocks[offset]
+
+	def get_block_offset(self, block_number: int) -> int:
+		# Offset of the planned block with the given number, 0 is the next block
+		offset = bisect_left(self.block_numbers, block_number)
+		if offset == len(self.block_numbers) or self.block_numbers[offset] != block_number:
+			raise IndexError(f'Block {block_number} is not planned')
+
+		return offset
+
+	def seal_block(self) -> list[dict]:
+		# Transactions added while the next block is being mined go into the blocks after it
+		self.sealed = True
+		return self.blocks[0]
+
+	def unseal_block(self):
+		self.sealed = False
+
+	def remove(self, tx_ids: set[str]):
+		# Later transactions are not moved into the gaps, blocks which become empty are dropped
+		if not tx_ids:
+			return
+
+		for i in reversed(range(len(self.blocks))):
+			transactions = [tx for tx in self.blocks[i] if tx['tx_id'] not in tx_ids]
+			if len(transactions) == len(self.blocks[i]):
+				continue
+
+			size = sum(self.get_size(tx) for tx in self.blocks[i] if tx['tx_id'] in tx_ids)
+			self.count -= len(self.blocks[i]) - len(transactions)
+			self.bytes -= size
+
+			if transactions or len(self.blocks) == 1:
+				# A new list is used because the first block may be in use by the miner
+				self.blocks[i] = transactions
+				self.block_bytes[i] -= size
+			else:
+				del self.blocks[i]
+				del self.block_numbers[i]
+				del self.block_bytes[i]
+				del self.block_times[i]
+
+	def pop_block(self) -> list[dict]:
+		transactions = self.blocks.pop(0)
+		self.block_numbers.pop(0)
+		self.bytes -= self.block_bytes.pop(0)
+		self.block_times.pop(0)
+		self.count -= len(transactions)
+		self.sealed = False
+
+		if not self.blocks:
+			self.append_block()
+
+		return transactions
@@ -0,0 +1,58 @@
+import hashlib
+
+class MerkleTree:
+	# Leaves and inner nodes are hashed with different prefixes so one can not be passed off as the other
+	leaf_prefix = b'\x00'
+	node_prefix = b'\x01'
+
+	def __init__(self, leaves: list[str]):
+		self.levels: list[list[bytes]] = [[self.hash_leaf(leaf) for leaf in leaves]]
+
+		while len(self.levels[-1]) > 1:
+			level = self.levels[-1]
+			next_level = [self.hash_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+
+			# The last node of a level with an odd number of nodes is moved up unchanged
+			if len(level) % 2:
+				next_level.append(level[-1])
+
+			self.levels.append(next_level)
+
+	@property
+	def root(self) -> str:
+		if not self.levels[0]:
+			return hashlib.sha256(b'').hexdigest()
+
+		return self.levels[-1][0].hex()
+
+	def get_proof(self, position: int) -> list[dict]:
+		# Hashes of the sibling nodes on the way from the leaf to the root
+		proof = []
+
+		for level in self.levels[:-1]:
+			sibling = position ^ 1
+
+			if sibling < len(level):
+				proof.append({'hash': level[sibling].hex(), 'side': 'left' if sibling < position else 'right'})
+
+			position //= 2
+
+		return proof
+
+	@staticmethod
+	def get_root_from_proof(leaf: str, proof: list[dict]) -> str:
+		node = MerkleTree.hash_leaf(leaf)
+
+		for step in proof:
+			sibling = bytes.fromhex(step['hash'])
+			node = MerkleTree.hash_node(sibling, node) if step['side'] == 'left' else MerkleTree.hash_node(node, sibling)
+
+		return node.hex()
+
+	@staticmethod
+	def hash_leaf(leaf: str) -> bytes:
+		return hashlib.sha256(MerkleTree.leaf_prefix + leaf.encode()).digest()
+
+	@staticmethod
+	def hash_node(left: bytes, right: bytes) -> bytes:
+		return hashlib.sha256(MerkleTree.node_prefix + left + right).digest()
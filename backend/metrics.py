@@ -0,0 +1,117 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+from typing import Callable
+
+class Metrics:
+	# Counters and histograms are updated on the hot paths, so each update is only a lock and a few additions, gauges
+	# are read when the metrics are collected
+	default_buckets = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10] # Seconds
+
+	def __init__(self):
+		self.lock = threading.Lock()
+
+		# Name -> (type, help text)
+		self.descriptions: dict[str, tuple[str, str]] = {}
+		# Name -> labels -> value
+		self.counters: dict[str, dict[tuple, float]] = {}
+		# Name -> upper bounds of the buckets
+		self.buckets: dict[str, list[float]] = {}
+		# Name -> labels -> [count per bucket with the last one for larger values, sum]
+		self.histograms: dict[str, dict[tuple, list]] = {}
+		# Name -> function returning the current value
+		self.gauges: dict[str, Callable[[], float]] = {}
+
+	def add_counter(self, name: str, help_text: str):
+		with self.lock:
+			self.descriptions.setdefault(name, ('counter', help_text))
+			self.counters.setdefault(name, {})
+
+	def add_histogram(self, name: str, help_text: str, buckets: list[float] = None):
+		with self.lock:
+			self.descriptions.setdefault(name, ('histogram', help_text))
+			self.buckets.setdefault(name, buckets or self.default_buckets)
+			self.histograms.setdefault(name, {})
+
+	def add_gauge(self, name: str, help_text: str, function: Callable[[], float]):
+		with self.lock:
+			self.descriptions[name] = ('gauge', help_text)
+			self.gauges[name] = function
+
+	def increment(self, name: str, labels: dict = None, value: float = 1):
+		key = tuple(labels.items()) if labels else ()
+
+		with self.lock:
+			values = self.counters[name]
+			values[key] = values.get(key, 0) + value
+
+	def observe(self, name: str, value: float, labels: dict = None):
+		key = tuple(labels.items()) if labels else ()
+		buckets = self.buckets[name]
+		position = bisect_left(buckets, value)
+
+		with self.lock:
+			values = self.histograms[name].get(key)
+			if not values:
+				values = self.histograms[name][key] = [[0] * (len(buckets) + 1), 0]
+
+			values[0][position] += 1
+			values[1] += value
+
+	@contextmanager
+	def time(self, name: str, labels: dict = None):
+		start = time.perf_counter()
+
+		try:
+			yield
+		finally:
+			self.observe(name, time.perf_counter() - start, labels)
+
+	@staticmethod
+	def format_labels(labels: tuple, extra: str = None) -> str:
+		parts = [f'{key}="{Metrics.escape(str(value))}"' for key, value in labels]
+		if extra:
+			parts.append(extra)
+
+		return '{' + ','.join(parts) + '}' if parts else ''
+
+	@staticmethod
+	def escape(value: str) -> str:
+		return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+	@staticmethod
+	def format_value(value: float) -> str:
+		return repr(float(value)) if isinstance(value, float) else str(value)
+
+	def to_text(self) -> str:
+		# Prometheus text exposition format
+		with self.lock:
+			descriptions = dict(self.descriptions)
+			counters = {name: dict(values) for name, values in self.counters.items()}
+			histograms = {name: {key: [list(values[0]), values[1]] for key, values in series.items()} for name, series in self.histograms.items()}
+			gauges = dict(self.gauges)
+
+		lines = []
+		for name, (metric_type, help_text) in sorted(descriptions.items()):
+			lines.append(f'# HELP {name} {help_text}')
+			lines.append(f'# TYPE {name} {metric_type}')
+
+			if metric_type == 'counter':
+				for key, value in counters[name].items():
+					lines.append(f'{name}{self.format_labels(key)} {self.format_value(value)}')
+			elif metric_type == 'gauge':
+				lines.append(f'{name} {self.format_value(gauges[name]())}')
+			else:
+				for key, (counts, total) in histograms[name].items():
+					cumulative = 0
+
+					for bound, count in zip(self.buckets[name] + ['+Inf'], counts):
+						cumulative += count
+						bound_label = f'le="{bound}"'
+						lines.append(f'{name}_bucket{self.format_labels(key, bound_label)} {cumulative}')
+
+					lines.append(f'{name}_sum{self.format_labels(key)} {self.format_value(total)}')
+					lines.append(f'{name}_count{self.format_labels(key)} {cumulative}')
+
+		return '\n'.join(lines) + '\n'
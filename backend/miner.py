@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import queue
+
+from block import Block
+
+def get_process_context():
+	# Fork avoids re-importing main.py in every worker, fall back to spawn where it is not available
+	start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+	return multiprocessing.get_context(start_method)
+
+def search_nonces(block: Block, static_data: str, start: int, step: int, difficulty: int, stop_event, results):
+	# Every worker checks every step-th nonce beginning from its own start
+	block.nonce = start
+	prefix_hash = block.get_prefix_hash(static_data)
+
+	while not stop_event.is_set():
+		for _ in range(Miner.batch_size):
+			proof = block.compute_hash_from_prefix(prefix_hash)
+
+			if proof.startswith('0' * difficulty):
+				results.put((block.nonce, proof))
+				return
+
+			block.nonce += step
+
+class Miner:
+	batch_size = 10000 # Nonces checked between looking at the stop event
+	poll_interval = 0.05 # Seconds
+	inline_work = 2 ** 14 # Expected hashes up to which searching in this process is faster than starting workers
+
+	def __init__(self, workers: int = None):
+		self.workers = workers or os.cpu_count() or 1
+		self.context = get_process_context()
+		self.stop_event = self.context.Event()
+
+	def cancel(self):
+		self.stop_event.set()
+
+	def proof_of_work(self, block: Block, difficulty: int) -> str:
+		static_data = block.get_static_data()
+		self.stop_event.clear()
+
+		# Starting the workers takes longer than finding an easy proof
+		if 16 ** difficulty <= self.inline_work:
+			return self.search_inline(block, static_data, difficulty)
+
+		results = self.context.Queue()
+		workers = [
+			self.context.Process(
+				target=search_nonces,
+				args=(block, static_data, i, self.workers, difficulty, self.stop_event, results),
+				daemon=True
+			)
+			for i in range(self.workers)
+		]
+
+		for worker in workers:
+			worker.start()
+
+		proof = None
+		try:
+			while not self.stop_event.is_set():
+				try:
+					block.nonce, proof = results.get(timeout=self.poll_interval)
+					break
+				except queue.Empty:
+					# Stop waiting if all workers died without finding a proof
+					if not any(worker.is_alive() for worker in workers) and results.empty():
+						break
+		finally:
+			# Stop the remaining workers
+			self.stop_event.set()
+			for worker in workers:
+				worker.join()
+
+		return proof
+
+	def search_inline(self, block: Block, static_data: str, difficulty: int) -> str:
+		results = queue.Queue()
+		search_nonces(block, static_data, 0, 1, difficulty, self.stop_event, results)
+
+		return None if results.empty() else results.get()[1]
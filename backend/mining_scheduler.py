@@ -0,0 +1,119 @@
+from collections import OrderedDict
+import threading
+import time
+import traceback
+from typing import Callable
+import uuid
+
+from block import Block
+from blockchain import Blockchain
+from mempool import Mempool
+
+class MiningScheduler:
+	poll_interval = 0.05 # Seconds between checks of the mempool
+	max_jobs = 1000 # Finished jobs remembered for the status endpoint
+
+	def __init__(self, blockchain: Blockchain, max_transactions: int = None, max_bytes: int = None, max_wait: int = None, on_block_mined: Callable[[Block], None] = None):
+		self.blockchain = blockchain
+		self.on_block_mined = on_block_mined
+
+		# A block is mined automatically once the next block reaches any of the set limits, max_wait is in milliseconds
+		self.max_transactions = max_transactions
+		self.max_bytes = max_bytes
+		self.max_wait = max_wait
+
+		self.jobs: OrderedDict[str, dict] = OrderedDict()
+		self.queued_jobs: list[dict] = []
+		self.jobs_lock = threading.Lock()
+
+		self.wake = threading.Event()
+		self.thread = threading.Thread(target=self.run, daemon=True)
+
+	def start(self):
+		self.thread.start()
+
+	def request_block(self) -> dict:
+		# Mines the next block as soon as possible, returns a job whose status is updated once it is done
+		job = {'id': uuid.uuid4().hex, 'status': 'queued', 'block_index': None, 'message': None}
+
+		with self.jobs_lock:
+			self.jobs[job['id']] = job
+			self.queued_jobs.append(job)
+
+			while len(self.jobs) > self.max_jobs:
+				self.jobs.popitem(last=False)
+
+		self.wake.set()
+		return job
+
+	def get_job(self, job_id: str) -> dict:
+		with self.jobs_lock:
+			job = self.jobs.get(job_id)
+			return dict(job) if job else None
+
+	def is_block_ready(self) -> bool:
+		# The mempool is changed by writers, so it is only read while they are blocked
+		with self.blockchain.state_lock.read():
+			return self.is_mempool_ready(self.blockchain.mempool)
+
+	def is_mempool_ready(self, mempool: Mempool) -> bool:
+		if not mempool:
+			return False
+
+		# Transactions which do not fit into the next block mean that it is full
+		if len(mempool.blocks) > 1:
+			return True
+
+		if self.max_transactions and len(mempool.get_block(0)) >= self.max_transactions:
+			return True
+
+		if self.max_bytes and mempool.block_bytes[0] >= self.max_bytes:
+			return True
+
+		return bool(self.max_wait) and (time.monotonic() - mempool.block_times[0]) * 1000 >= self.max_wait
+
+	@property
+	def is_automatic(self) -> bool:
+		return bool(self.max_transactions or self.max_bytes or self.max_wait)
+
+	def run(self):
+		while True:
+			self.wake.wait(self.poll_interval)
+			self.wake.clear()
+
+			with self.jobs_lock:
+				jobs = self.queued_jobs
+				self.queued_jobs = []
+
+				for job in jobs:
+					job['status'] = 'mining'
+
+			# An error must not stop the scheduler, the jobs it was mining for fail instead
+			try:
+				if jobs or (self.is_automatic and self.is_block_ready()):
+					self.mine(jobs)
+			except Exception as e:
+				traceback.print_exc()
+				self.finish_jobs(jobs, None, f'Mining failed: {e}')
+
+	def mine(self, jobs: list[dict]):
+		if not self.blockchain.mempool:
+			self.finish_jobs(jobs, None, 'No transactions to mine')
+			return
+
+		block_index = self.blockchain.mine()
+		self.finish_jobs(jobs, block_index, None if block_index else 'Mining was interrupted')
+
+		if block_index and self.on_block_mined:
+			self.on_block_mined(self.blockchain.snapshot[block_index])
+
+	def finish_jobs(self, jobs: list[dict], block_index: int, message: str):
+		# Jobs which are already finished are kept as they are
+		with self.jobs_lock:
+			for job in jobs:
+				if job['status'] != 'mining':
+					continue
+
+				job['status'] = 'mined' if block_index else 'failed'
+				job['block_index'] = block_index or None
+				job['message'] = message
@@ -1,17 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor, wait
 import json
 import os
+import queue
+import random
+import threading
 import time
 import uuid
 
+from block import Block
 from blockchain import Blockchain
+from chain_index import ChainIndex
+from chain_snapshot import ChainSnapshot
+from metrics import Metrics
 from node import Node
 
 class Network:
 	nodes_file = 'data/nodes.json'
+	fetch_workers = 16 # Nodes contacted at the same time
+	fetch_deadline = 30 # Seconds to wait for all nodes while resolving conflicts
+	header_window = 64 # Headers compared at first while looking for the common ancestor
+	block_batch_size = 100 # Blocks downloaded per request
+	gossip_fanout = 8 # Nodes a new block is announced to, each of them announces it to its own nodes
+	max_announcements = 100 # Announcements waiting to be sent
 
-	def __init__(self):
+	def __init__(self, metrics: Metrics = None):
 		self.own_node_id = str(uuid.uuid4()).replace('-', '')
 		self.nodes: list[Node] = []
+		self.nodes_lock = threading.Lock()
+		self.executor = ThreadPoolExecutor(max_workers=self.fetch_workers)
+
+		self.metrics = metrics if metrics is not None else Metrics()
+		self.metrics.add_histogram('network_resolve_conflicts_seconds', 'Time spent resolving conflicts with all nodes')
+		self.metrics.add_histogram('network_node_sync_seconds', 'Time spent syncing with a node', [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60])
+
+		# New blocks are announced to other nodes in the background
+		self.announcements: queue.Queue[tuple[str, str]] = queue.Queue(maxsize=self.max_announcements)
+		self.syncing: set[str] = set() # Nodes which are being synced with because of an announced block
+		self.sender = threading.Thread(target=self.send_announcements, daemon=True)
+		self.sender.start()
 
 		if os.path.exists(self.nodes_file):
 			self.load_from_disk()
@@ -19,44 +45,191 @@ class Network:
 			self.save_to_disk()
 
 	def add_node(self, node: Node):
-		self.nodes.append(node)
-		self.save_to_disk()
+		# A new list is used so that the nodes can be read without locking
+		with self.nodes_lock:
+			self.nodes = self.nodes + [node]
+			self.save_to_disk()
 
 	def update_node_address(self, node: Node) -> bool:
-		for n in self.nodes:
-			if n.node_id == node.node_id:
-				n.address = node.address
-				self.save_to_disk()
-				return True
+		with self.nodes_lock:
+			for n in self.nodes:
+				if n.node_id == node.node_id:
+					n.address = node.address
+					self.save_to_disk()
+					return True
 
 		return False
 
+	def get_node(self, node_id: str) -> Node:
+		return next((node for node in self.nodes if node.node_id == node_id), None)
+
+	def announce_block(self, block: Block, exclude_node_id: str = None):
+		data = '{"block": ' + block.to_json() + ', "nodeID": ' + json.dumps(self.own_node_id) + '}'
+
+		# Announcements are dropped while too many are waiting, nodes still get the blocks with the next one
+		try:
+			self.announcements.put_nowait((data, exclude_node_id))
+		except queue.Full:
+			pass
+
+	def send_announcements(self):
+		while True:
+			data, exclude_node_id = self.announcements.get()
+
+			nodes = [node for node in self.nodes if node.node_id != exclude_node_id and node.is_available()]
+			for node in random.sample(nodes, min(self.gossip_fanout, len(nodes))):
+				self.executor.submit(node.announce_block, data)
+
+	def receive_block(self, blockchain: Blockchain, block: Block, node_id: str) -> str:
+		# Returns whether the block was added, already known, is being synced or was rejected
+		node = self.get_node(node_id)
+		if not node:
+			return 'rejected'
+
+		snapshot = blockchain.snapshot
+		if block.index < len(snapshot) and snapshot.get_block_hash(block.index) == block.hash:
+			return 'known'
+
+		# Transactions have to be records the chain index can add and roll back, the rest is checked when it is added
+		if not all(ChainIndex.is_valid_record(tx) for tx in block.transactions):
+			return 'rejected'
+
+		if blockchain.add_received_block(block):
+			self.announce_block(block, node_id)
+			return 'added'
+
+		# Only a block after our tip with a valid proof of work is worth syncing for, a block on top of our tip which was
+		# not added is invalid
+		if block.index < len(snapshot) or not Blockchain.is_valid_proof(block.hash):
+			return 'rejected'
+
+		if block.prev_hash == snapshot.get_block_hash(len(snapshot) - 1):
+			return 'rejected'
+
+		if not block.has_valid_merkle_root() or block.compute_hash(block.get_static_data()) != block.hash:
+			return 'rejected'
+
+		# The block does not follow our tip, so the blocks missing in between are synced from the node that sent it
+		with self.nodes_lock:
+			if node_id in self.syncing:
+				return 'syncing'
+
+			self.syncing.add(node_id)
+
+		self.executor.submit(self.sync_from_node, node, blockchain)
+		return 'syncing'
+
+	def sync_from_node(self, node: Node, blockchain: Blockchain):
+		try:
+			fork_point, blocks = self.sync_with_node(node, blockchain)
+
+			if blocks and blockchain.replace_blocks(fork_point, blocks):
+				self.announce_block(blocks[-1], node.node_id)
+		finally:
+			with self.nodes_lock:
+				self.syncing.discard(node.node_id)
+
+	def find_fork_point(self, node: Node, snapshot: ChainSnapshot, length: int) -> int:
+		# Compare headers from the top, looking further back each time, until a common block is found
+		end = min(len(snapshot), length)
+		window = self.header_window
+
+		while end > 0:
+			start = max(0, end - window)
+
+			headers = node.get_headers(start, end - start)
+			if not headers or len(headers) != end - start:
+				return None
+
+			for i in reversed(range(start, end)):
+				if headers[i - start]['hash'] == snapshot.get_block_hash(i):
+					return i + 1
+
+			end = start
+			window *= 2
+
+		return 0
+
+	def sync_with_node(self, node: Node, blockchain: Blockchain) -> tuple[int, list[Block]]:
+		# A node sending malformed data fails on its own, so the results of the other nodes are still used
+		with self.metrics.time('network_node_sync_seconds', {'node': node.address}):
+			try:
+				return self.fetch_blocks(node, blockchain)
+			except Exception:
+				node.record_failure()
+				return None, None
+
+	def fetch_blocks(self, node: Node, blockchain: Blockchain) -> tuple[int, list[Block]]:
+		# Returns the fork point and the blocks after it, no blocks if the node's chain is not longer
+		length, tip_hash = node.get_tip()
+		if not length:
+			return None, None
+
+		snapshot = blockchain.snapshot
+		if length <= len(snapshot):
+			return len(snapshot), []
+
+		fork_point = self.find_fork_point(node, snapshot, length)
+		if fork_point is None:
+			return None, None
+
+		blocks = []
+		for start in range(fork_point, length, self.block_batch_size):
+			batch = node.get_blocks(start, min(self.block_batch_size, length - start))
+			if not batch:
+				return None, None
+
+			blocks.extend(batch)
+
+		# Node's chain may have changed during the download
+		if len(blocks) != length - fork_point or blocks[-1].hash != tip_hash:
+			return None, None
+
+		# Only the new blocks and their link to the fork point have to be validated
+		prev_blocks = [snapshot[fork_point - 1]] if fork_point else []
+		if not blockchain.is_valid_chain_cached(prev_blocks + blocks):
+			return None, None
+
+		return fork_point, blocks
+
 	def resolve_conflicts(self, blockchain: Blockchain) -> bool:
-		new_chain = None
-		max_length = len(blockchain.chain)
+		start = time.perf_counter()
+		new_fork_point = None
+		new_blocks = None
+		max_length = len(blockchain.snapshot)
 		resolved = False
 
-		for node in self.nodes:
-			length, node_chain = node.get_chain()
-			if not node_chain:
-				continue
+		# Sync with all available nodes at the same time
+		futures = {self.executor.submit(self.sync_with_node, node, blockchain): node for node in self.nodes if node.is_available()}
+		done, not_done = wait(futures, timeout=self.fetch_deadline)
+
+		for future in not_done:
+			futures[future].record_failure()
+
+		for future in done:
+			node = futures[future]
 
-			if length != len(node_chain):
+			fork_point, blocks = future.result()
+			if fork_point is None:
 				continue
 
-			if length > max_length and Blockchain.is_valid_chain(node_chain):
-				new_chain = node_chain
-				max_length = length
+			if fork_point + len(blocks) > max_length:
+				new_fork_point = fork_point
+				new_blocks = blocks
+				max_length = fork_point + len(blocks)
 
 			node.resolved_at = time.time_ns()
 			resolved = True
 
-		if new_chain:
-			blockchain.replace_chain(new_chain)
+		# Blocks may have been added to our chain since the nodes were synced, in which case it is kept
+		if new_blocks:
+			blockchain.replace_blocks(new_fork_point, new_blocks)
 
 		if resolved:
-			self.save_to_disk()
+			with self.nodes_lock:
+				self.save_to_disk()
 
+		self.metrics.observe('network_resolve_conflicts_seconds', time.perf_counter() - start)
 		return resolved
 
 	def from_json_format(self, data: dict):
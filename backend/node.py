@@ -1,37 +1,112 @@
+import time
+
 import requests
 
 from block import Block
 
 class Node:
+	timeout = (3, 10) # Seconds to connect and to wait for data
+	max_backoff = 300 # Seconds
+
 	def __init__(self, address: str, node_id: str = None):
 		self.address = address
 		self.node_id = node_id
 		self.resolved_at = None
 
-	def get_chain(self) -> tuple[int, list[Block]]:
-		response = requests.get('http://' + self.address + '/chain')
+		# Keeps connections to the node alive between requests
+		self.session = requests.Session()
+
+		# Failing nodes are skipped until retry_at with exponentially growing waits
+		self.failures = 0
+		self.retry_at = 0
+
+	def is_available(self) -> bool:
+		return time.monotonic() >= self.retry_at
+
+	def record_success(self):
+		self.failures = 0
+		self.retry_at = 0
+
+	def record_failure(self):
+		self.failures += 1
+		self.retry_at = time.monotonic() + min(2 ** self.failures, self.max_backoff)
+
+	def get(self, path: str, params: dict = None) -> dict:
+		try:
+			response = self.session.get('http://' + self.address + path, params=params, timeout=self.timeout)
+		except requests.RequestException:
+			self.record_failure()
+			return None
 
 		if response.status_code != 200:
-			return None, None
+			self.record_failure()
+			return None
 
 		try:
 			response_json = response.json()
 		except:
+			self.record_failure()
+			return None
+
+		self.record_success()
+		return response_json
+
+	def get_tip(self) -> tuple[int, str]:
+		response_json = self.get('/chain/tip')
+		if not isinstance(response_json, dict):
 			return None, None
 
-		chain_data = response_json['chain']
+		length, tip_hash = response_json.get('length'), response_json.get('hash')
+		if type(length) is not int or not isinstance(tip_hash, str):
+			self.record_failure()
+			return None, None
 
-		return response_json['length'], [Block.from_dict(block) for block in chain_data]
+		return length, tip_hash
 
-	def retrieve_node_id(self) -> str:
-		response = requests.get('http://' + self.address + '/node/id')
+	def get_headers(self, start: int, limit: int) -> list[dict]:
+		response_json = self.get('/chain/headers', {'from': start, 'limit': limit})
+		if not isinstance(response_json, dict):
+			return None
 
-		if response.status_code != 200:
+		# Headers are compared by their hashes
+		headers = response_json.get('headers')
+		if not isinstance(headers, list) or not all(isinstance(header, dict) and isinstance(header.get('hash'), str) for header in headers):
+			self.record_failure()
+			return None
+
+		return headers
+
+	def get_blocks(self, start: int, limit: int) -> list[Block]:
+		response_json = self.get('/chain/blocks', {'from': start, 'limit': limit})
+		if not isinstance(response_json, dict):
 			return None
 
+		# Blocks are validated after they were downloaded, only their shape is checked here
 		try:
-			response_json = response.json()
-		except:
+			blocks = [Block.from_dict(block) for block in response_json.get('blocks')]
+		except (KeyError, TypeError, ValueError, AttributeError):
+			blocks = None
+
+		if not blocks or not all(type(block.index) is int and isinstance(block.hash, str) for block in blocks):
+			self.record_failure()
+			return None
+
+		return blocks
+
+	def announce_block(self, data: str) -> bool:
+		try:
+			response = self.session.post('http://' + self.address + '/block/announce', data=data, headers={'Content-Type': 'application/json'}, timeout=self.timeout)
+		except requests.RequestException:
+			self.record_failure()
+			return False
+
+		# A rejected block does not mean that the node is unavailable
+		self.record_success()
+		return response.status_code in [200, 201, 202]
+
+	def retrieve_node_id(self) -> str:
+		response_json = self.get('/node/id')
+		if not isinstance(response_json, dict) or not isinstance(response_json.get('nodeID'), str):
 			return None
 
 		self.node_id = response_json['nodeID']
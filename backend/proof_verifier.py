@@ -0,0 +1,122 @@
+# Verifies an order history returned by GET /order/<order_code>/proof without downloading the chain, the headers in the
+# response have to link the blocks to a block hash the client trusts, such as the tip of a node it trusts, or a block it
+# trusted before, whose index can be sent as ?trusted=<index> so the headers after it are left out
+# Usage (from the backend directory): python -m proof_verifier <response file> <trusted block hash> [...]
+import json
+import sys
+
+from block import Block
+from blockchain import Blockchain
+from merkle_tree import MerkleTree
+from transaction.transaction_record import TransactionRecord
+
+class ProofVerifier:
+	def __init__(self, trusted_hashes: set[str]):
+		# Hashes of blocks known to be in the chain
+		self.trusted_hashes = trusted_hashes
+
+	def verify_header(self, header: dict, transactions: list = None) -> bool:
+		block = Block(
+			index=header['index'],
+			transactions=transactions or [],
+			prev_hash=header['prev_hash'],
+			timestamp=header['timestamp'],
+			nonce=header['nonce'],
+			version=header.get('version', Block.legacy_version),
+			merkle_root=header.get('merkle_root')
+		)
+
+		if block.version not in Block.versions or (not block.is_legacy and block.merkle_root is None):
+			return False
+
+		return Blockchain.is_valid_proof(header['hash']) and block.compute_hash(block.get_static_data()) == header['hash']
+
+	def verify_entry(self, entry: dict, headers: dict[str, dict]) -> bool:
+		header = headers.get(str(entry['blockIndex']))
+		if not header or header['index'] != entry['blockIndex']:
+			return False
+
+		tx_data = TransactionRecord.encode(TransactionRecord.from_dict(entry['transaction']))
+
+		# Transactions in current blocks are proven by a path to the Merkle root in the header
+		if 'proof' in entry:
+			if header.get('version', Block.legacy_version) == Block.legacy_version:
+				return False
+
+			return MerkleTree.get_root_from_proof(tx_data, entry['proof']) == header['merkle_root'] and self.verify_header(header)
+
+		# Legacy blocks are hashed with all of their transactions
+		block_transactions = [TransactionRecord.from_dict(tx) for tx in entry['blockTransactions']]
+		position = entry['position']
+
+		if not 0 <= position < len(block_transactions) or TransactionRecord.encode(block_transactions[position]) != tx_data:
+			return False
+
+		return header.get('version', Block.legacy_version) == Block.legacy_version and self.verify_header(header, block_transactions)
+
+	def get_linked_indexes(self, headers: dict[str, dict], block_transactions: dict[int, list]) -> set[int]:
+		# Indexes of the headers whose hash is trusted or which the linked header after them points to with its prev_hash,
+		# legacy headers can only be checked with the transactions of their block
+		headers_by_index = {header['index']: header for key, header in headers.items() if key == str(header['index'])}
+		linked = set()
+
+		for index in sorted(headers_by_index, reverse=True):
+			header = headers_by_index[index]
+			next_header = headers_by_index.get(index + 1)
+
+			if not self.verify_header(header, block_transactions.get(index)):
+				continue
+
+			if header['hash'] in self.trusted_hashes or (index + 1 in linked and next_header['prev_hash'] == header['hash']):
+				linked.add(index)
+
+		return linked
+
+	def verify_history(self, response: dict, order_code: str) -> bool:
+		# Transactions are ordered from the newest to the oldest
+		entries = response['transactions']
+		if not entries:
+			return False
+
+		block_transactions = {}
+		for entry in entries:
+			if 'blockTransactions' in entry:
+				block_transactions[entry['blockIndex']] = [TransactionRecord.from_dict(tx) for tx in entry['blockTransactions']]
+
+		linked = self.get_linked_indexes(response['headers'], block_transactions)
+
+		for entry in entries:
+			tx = TransactionRecord.from_dict(entry['transaction'])
+
+			if not isinstance(tx, TransactionRecord) or tx.get('order_code') != order_code or tx['tx_id'] != tx.generate_tx_id():
+				return False
+
+			if entry['blockIndex'] not in linked or not self.verify_entry(entry, response['headers']):
+				return False
+
+		# Every transaction has to follow the one before it
+		for newer, older in zip(entries, entries[1:]):
+			if newer['transaction']['prev_tx_id'] != older['transaction']['tx_id']:
+				return False
+
+		# 1 - CreateOrder
+		return entries[-1]['transaction']['type'] == 1
+
+def main():
+	if len(sys.argv) < 3:
+		print('Usage: python -m proof_verifier <response file> <trusted block hash> [...]')
+		sys.exit(2)
+
+	with open(sys.argv[1], 'r') as f:
+		response = json.load(f)
+
+	verifier = ProofVerifier(set(sys.argv[2:]))
+
+	if verifier.verify_history(response, response['orderCode']):
+		print(f'Order {response["orderCode"]}: {len(response["transactions"])} transactions verified')
+	else:
+		print(f'Order {response["orderCode"]}: verification failed')
+		sys.exit(1)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+import threading
+
+class ReadWriteLock:
+	# Any number of readers or a single writer, waiting writers go before new readers so they are not starved
+	def __init__(self):
+		self.condition = threading.Condition()
+		self.readers = 0
+		self.writing = False
+		self.waiting_writers = 0
+
+	@contextmanager
+	def read(self):
+		with self.condition:
+			while self.writing or self.waiting_writers:
+				self.condition.wait()
+
+			self.readers += 1
+
+		try:
+			yield
+		finally:
+			with self.condition:
+				self.readers -= 1
+
+				if not self.readers:
+					self.condition.notify_all()
+
+	@contextmanager
+	def write(self):
+		with self.condition:
+			self.waiting_writers += 1
+
+			while self.writing or self.readers:
+				self.condition.wait()
+
+			self.waiting_writers -= 1
+			self.writing = True
+
+		try:
+			yield
+		finally:
+			with self.condition:
+				self.writing = False
+				self.condition.notify_all()
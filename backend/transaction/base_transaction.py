@@ -1,9 +1,7 @@
 import abc
-import hashlib
-import json
 import time
 
-from block import Block
+from transaction.transaction_record import TransactionRecord
 
 class BaseTransaction(abc.ABC):
 	def __init__(self, type: int, created_by: str, data: dict):
@@ -18,18 +16,10 @@ class BaseTransaction(abc.ABC):
 		self.tx_id: str = None
 
 	def get_static_data(self) -> str:
-		return json.dumps({
-			'timestamp': self.timestamp,
-			'type': self.type,
-			'created_by': self.created_by,
-			'data': self.data,
-			'prev_tx_id': self.prev_tx_id,
-			'prev_tx_block_id': self.prev_tx_block_id
-		}, sort_keys=True)
+		return self.to_record().get_static_data()
 
 	def generate_tx_id(self):
-		transaction_string = self.get_static_data()
-		return hashlib.sha256(transaction_string.encode()).hexdigest() 
+		return self.to_record().generate_tx_id()
 
 	def to_dict(self) -> dict:
 		return {
@@ -42,6 +32,9 @@ class BaseTransaction(abc.ABC):
 			'tx_id': self.tx_id
 		}
 
+	def to_record(self) -> TransactionRecord:
+		return TransactionRecord.from_dict(self.to_dict())
+
 	def to_json_format(self) -> dict:
 		return {
 			'timestamp': self.timestamp,
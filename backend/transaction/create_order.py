@@ -1,9 +1,10 @@
-from typing import override
+from typing import override, TYPE_CHECKING
 import uuid
 
-from block import Block
 from transaction.base_order import BaseOrder
-from transaction.base_transaction import BaseTransaction
+
+if TYPE_CHECKING:
+	from blockchain import Blockchain
 
 class CreateOrder(BaseOrder):
 	def __init__(self, created_by: str, data: dict):
@@ -12,22 +13,22 @@ class CreateOrder(BaseOrder):
 	def generate_order_code(self):
 		return str(uuid.uuid4()).replace('-', '').upper()
 
-	def get_org_tx(self, chain: list[Block], pending_transactions: list[BaseTransaction]) -> tuple[str, int]:
-		for tx in reversed(pending_transactions):
-			if tx['type'] == 0 and tx['tx_id'] == self.created_by:
-				return tx['tx_id'], chain[-1].index + 1
+	def get_org_tx(self, blockchain: 'Blockchain') -> tuple[str, int]:
+		# IDs from requests are used as keys of the index, so other types can not be an organization
+		if not isinstance(self.created_by, str):
+			return None, None
+
+		tx, block_index = blockchain.get_transaction(self.created_by)
 
-		for block in reversed(chain):
-			for tx in reversed(block.transactions):
-				if tx['type'] == 0 and tx['tx_id'] == self.created_by:
-					return tx['tx_id'], block.index
+		if not tx or tx['type'] != 0:
+			return None, None
 
-		return None, None
+		return tx['tx_id'], blockchain.get_planned_index(block_index)
 
 	@override
-	def validate(self, chain: list[Block], pending_transactions: list[BaseTransaction]) -> bool:
+	def validate(self, blockchain: 'Blockchain') -> bool:
 		# Verify that the order was created by an existing organization
-		prev_tx_id, prev_tx_block_id = self.get_org_tx(chain, pending_transactions)
+		prev_tx_id, prev_tx_block_id = self.get_org_tx(blockchain)
 		if not prev_tx_id:
 			return False
 
@@ -0,0 +1,108 @@
+from collections.abc import Mapping
+import hashlib
+import json
+
+def encode_keys(fields: tuple[str, ...]) -> tuple[tuple[str, str], ...]:
+	# Fields in sorted order with the JSON encoding of their key
+	return tuple((key, json.dumps(key) + ': ') for key in sorted(fields))
+
+class TransactionRecord(Mapping):
+	# Compact read only view of transaction data which is accessed like the dict it was created from
+	fields = ('timestamp', 'type', 'created_by', 'data', 'prev_tx_id', 'prev_tx_block_id', 'tx_id')
+	__slots__ = fields + ('canonical_data',)
+	encoded_keys = encode_keys(fields)
+
+	def __init__(self, data: dict):
+		for key in self.fields:
+			setattr(self, key, data[key])
+
+		self.canonical_data: str = None # JSON encoding kept so it is serialized only once
+
+	def __getitem__(self, key: str):
+		if key not in self.fields:
+			raise KeyError(key)
+
+		return getattr(self, key)
+
+	def __setitem__(self, key: str, value):
+		if key not in self.fields:
+			raise KeyError(key)
+
+		setattr(self, key, value)
+		self.canonical_data = None
+
+	def __iter__(self):
+		return iter(self.fields)
+
+	def __len__(self) -> int:
+		return len(self.fields)
+
+	def __repr__(self) -> str:
+		return repr(self.to_dict())
+
+	def __reduce__(self):
+		# Cached encodings are not sent to other processes
+		return TransactionRecord.from_dict, (self.to_dict(),)
+
+	def to_dict(self) -> dict:
+		return {key: getattr(self, key) for key in self.fields}
+
+	def encode_fields(self, skip_key: str = None) -> list[str]:
+		return [prefix + json.dumps(getattr(self, key), sort_keys=True) for key, prefix in self.encoded_keys if key != skip_key]
+
+	def get_static_data(self) -> str:
+		# Gives the same result as json.dumps(..., sort_keys=True) of all fields except tx_id
+		return '{' + ', '.join(self.encode_fields('tx_id')) + '}'
+
+	def get_canonical_data(self) -> str:
+		if self.canonical_data is None:
+			self.canonical_data = '{' + ', '.join(self.encode_fields()) + '}'
+
+		return self.canonical_data
+
+	def generate_tx_id(self) -> str:
+		return hashlib.sha256(self.get_static_data().encode()).hexdigest()
+
+	def assign_tx_id(self) -> str:
+		# The fields are encoded once for both the tx_id and the canonical data
+		encoded = self.encode_fields('tx_id')
+		self.tx_id = hashlib.sha256(('{' + ', '.join(encoded) + '}').encode()).hexdigest()
+
+		position = [key for key, _ in self.encoded_keys].index('tx_id')
+		encoded.insert(position, self.encoded_keys[position][1] + json.dumps(self.tx_id))
+		self.canonical_data = '{' + ', '.join(encoded) + '}'
+
+		return self.tx_id
+
+	@staticmethod
+	def from_dict(data: dict) -> 'TransactionRecord|dict':
+		if isinstance(data, TransactionRecord):
+			return data
+
+		# Data which does not match any known transaction kind is kept as it is
+		record_class = record_classes.get(frozenset(data))
+		if not record_class:
+			return dict(data)
+
+		return record_class(data)
+
+	@staticmethod
+	def encode(tx: dict) -> str:
+		if isinstance(tx, TransactionRecord):
+			return tx.get_canonical_data()
+
+		return json.dumps(tx, sort_keys=True)
+
+class OrderRecord(TransactionRecord):
+	# CreateOrder, UpdateOrder and CompleteOrder
+	fields = TransactionRecord.fields + ('order_code',)
+	__slots__ = ('order_code',)
+	encoded_keys = encode_keys(fields)
+
+class TransferOrderRecord(OrderRecord):
+	fields = OrderRecord.fields + ('new_owner',)
+	__slots__ = ('new_owner',)
+	encoded_keys = encode_keys(fields)
+
+# CreateOrganization transactions use TransactionRecord itself
+record_classes = {frozenset(record_class.fields): record_class for record_class in [TransactionRecord, OrderRecord, TransferOrderRecord]}
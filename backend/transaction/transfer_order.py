@@ -1,4 +1,3 @@
-import json
 from typing import override
 
 from transaction.base_order import BaseOrder
@@ -8,19 +7,6 @@ class TransferOrder(BaseOrder):
 		self.new_owner = new_owner
 		super().__init__(3, created_by, data, order_code)
 
-	@override
-	def get_static_data(self) -> str:
-		return json.dumps({
-			'timestamp': self.timestamp,
-			'type': self.type,
-			'created_by': self.created_by,
-			'data': self.data,
-			'prev_tx_id': self.prev_tx_id,
-			'prev_tx_block_id': self.prev_tx_block_id,
-			'order_code': self.order_code,
-			'new_owner': self.new_owner
-		}, sort_keys=True)
-
 	@override
 	def to_dict(self) -> dict:
 		return {